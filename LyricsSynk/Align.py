@@ -0,0 +1,168 @@
+import re
+from difflib import SequenceMatcher
+
+NON_WORD = re.compile(r"[\W_]+")
+# Gaps up to this many word pairs are matched by spelling similarity
+SIMILARITY_CELLS = 400
+MIN_SIMILARITY = 0.5
+
+
+def token(word):
+    # Case and punctuation don't stop two words from matching
+    return NON_WORD.sub("", word.casefold()) or word
+
+
+def _unique_anchors(a, b, alo, ahi, blo, bhi):
+    # Patience diff: tokens that occur exactly once on both sides, in b order,
+    # reduced to the longest run that is increasing in a as well
+    count = {}
+    for i in range(alo, ahi):
+        c = count.setdefault(a[i], [0, 0, i])
+        c[0] += 1
+    for j in range(blo, bhi):
+        c = count.get(b[j])
+        if c is not None:
+            c[1] += 1
+            if c[1] == 1:
+                c.append(j)
+    candidates = sorted((c[3], c[2]) for c in count.values() if c[0] == 1 and c[1] == 1)
+    return _longest_increasing(candidates)
+
+
+def _longest_increasing(pairs):
+    # pairs are (j, i) sorted by j; returns the longest subsequence increasing in i
+    tails = []
+    tail_idx = []
+    prev = [-1] * len(pairs)
+    for k, (_, i) in enumerate(pairs):
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tails[mid] < i:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo > 0:
+            prev[k] = tail_idx[lo - 1]
+        if lo == len(tails):
+            tails.append(i)
+            tail_idx.append(k)
+        else:
+            tails[lo] = i
+            tail_idx[lo] = k
+    out = []
+    k = tail_idx[-1] if tail_idx else -1
+    while k >= 0:
+        j, i = pairs[k]
+        out.append((i, j))
+        k = prev[k]
+    out.reverse()
+    return out
+
+
+def _rarest_anchors(a, b, alo, ahi, blo, bhi):
+    # Histogram diff fallback when nothing is unique: pair up, in order, the
+    # occurrences of the common token that repeats least
+    pos_a = {}
+    for i in range(alo, ahi):
+        pos_a.setdefault(a[i], []).append(i)
+    pos_b = {}
+    for j in range(blo, bhi):
+        if b[j] in pos_a:
+            pos_b.setdefault(b[j], []).append(j)
+    if not pos_b:
+        return []
+    best = min(pos_b, key=lambda t: (len(pos_a[t]) + len(pos_b[t]), pos_b[t][0]))
+    return list(zip(pos_a[best], pos_b[best]))
+
+
+def _fill_gap(a_words, b_words, alo, ahi, blo, bhi, pairs):
+    m, n = ahi - alo, bhi - blo
+    if not m or not n:
+        return
+    if m == n:
+        # A run of replaced words keeps its slots when it is a respelling (a
+        # fixed typo), not when different words were written over it
+        pairs.extend((alo + k, blo + k) for k in range(m)
+                     if _similarity(a_words[alo + k], b_words[blo + k]) >= MIN_SIMILARITY)
+        return
+    if m * n > SIMILARITY_CELLS:
+        return
+    # Small uneven gap: ordered matching that maximises spelling similarity
+    score = [[0.0] * (n + 1) for _ in range(m + 1)]
+    for i in range(m - 1, -1, -1):
+        for j in range(n - 1, -1, -1):
+            best = max(score[i + 1][j], score[i][j + 1])
+            sim = _similarity(a_words[alo + i], b_words[blo + j])
+            if sim >= MIN_SIMILARITY:
+                best = max(best, score[i + 1][j + 1] + sim)
+            score[i][j] = best
+    i = j = 0
+    while i < m and j < n:
+        sim = _similarity(a_words[alo + i], b_words[blo + j])
+        if sim >= MIN_SIMILARITY and score[i][j] == score[i + 1][j + 1] + sim:
+            pairs.append((alo + i, blo + j))
+            i += 1
+            j += 1
+        elif score[i][j] == score[i + 1][j]:
+            i += 1
+        else:
+            j += 1
+
+
+def _similarity(x, y):
+    matcher = SequenceMatcher(None, x, y)
+    if matcher.real_quick_ratio() < MIN_SIMILARITY:
+        return 0.0
+    return matcher.ratio()
+
+
+def align(old_words, new_words):
+    # Returns increasing (old index, new index) pairs of words that correspond.
+    # Anchors found by patience (or histogram) diff split the problem into gaps,
+    # so the work stays close to linear in the number of words.
+    a = [token(w) for w in old_words]
+    b = [token(w) for w in new_words]
+    pairs = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            pairs.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            pairs.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+        anchors = _unique_anchors(a, b, alo, ahi, blo, bhi) or _rarest_anchors(a, b, alo, ahi, blo, bhi)
+        if not anchors:
+            _fill_gap(a, b, alo, ahi, blo, bhi, pairs)
+            continue
+        i0, j0 = alo, blo
+        for i, j in anchors:
+            pairs.append((i, j))
+            stack.append((i0, i, j0, j))
+            i0, j0 = i + 1, j + 1
+        stack.append((i0, ahi, j0, bhi))
+    pairs.sort()
+    return pairs
+
+
+def carry_timings(old_lyrics, new_lyrics):
+    # Copies timings from old words onto the new words they align with. Tags
+    # that survived in the new text win; only unmatched words stay untimed.
+    old = [w for ln in old_lyrics.lines for w in ln.words]
+    new = [w for ln in new_lyrics.lines for w in ln.words]
+    pairs = align([w.word for w in old], [w.word for w in new])
+    for i, j in pairs:
+        if new[j].start_time is None:
+            new[j].start_time = old[i].start_time
+        if new[j].end_time is None:
+            new[j].end_time = old[i].end_time
+    for ln in new_lyrics.lines:
+        if ln.start_time is None and ln.words and ln.words[0].start_time is not None:
+            ln.start_time = ln.words[0].start_time
+    return len(pairs)
@@ -0,0 +1,285 @@
+from abc import ABCMeta, abstractmethod
+from PySide6.QtCore import QObject, QTimer, QUrl, Signal
+
+
+class _BackendMeta(ABCMeta, type(QObject)):
+    pass
+
+
+class AudioBackend(QObject, metaclass=_BackendMeta):
+    # Positions and durations are in ms; rate 1.0 is normal speed
+    position_changed = Signal(int)
+    duration_changed = Signal(int)
+    state_changed = Signal(bool)
+    media_ended = Signal()
+
+    def __init__(self, parent=None):
+        # Shiboken builds QObjects without object.__new__, which is where ABC's
+        # check normally happens
+        if self.__abstractmethods__:
+            raise TypeError(f"Can't instantiate abstract class {type(self).__name__} "
+                            f"without {', '.join(sorted(self.__abstractmethods__))}")
+        super().__init__(parent)
+
+    @abstractmethod
+    def load(self, file_path):
+        ...
+
+    @abstractmethod
+    def play(self):
+        ...
+
+    @abstractmethod
+    def pause(self):
+        ...
+
+    @abstractmethod
+    def stop(self):
+        ...
+
+    @abstractmethod
+    def is_playing(self):
+        ...
+
+    @abstractmethod
+    def position(self):
+        ...
+
+    @abstractmethod
+    def set_position(self, ms):
+        ...
+
+    @abstractmethod
+    def duration(self):
+        ...
+
+    @abstractmethod
+    def rate(self):
+        ...
+
+    @abstractmethod
+    def set_rate(self, rate):
+        ...
+
+    @abstractmethod
+    def set_volume(self, volume):
+        ...
+
+    def toggle(self):
+        if self.is_playing():
+            self.pause()
+        else:
+            self.play()
+
+
+class VlcBackend(AudioBackend):
+    def __init__(self, parent=None, poll_interval=50):
+        super().__init__(parent)
+        import vlc
+        self.vlc = vlc
+        self.instance = vlc.Instance()
+        self.player = self.instance.media_player_new()
+        self.player.audio_set_volume(50)
+        self._playing = False
+        self._duration = 0
+        # libvlc has no Qt signals, so state is polled on the GUI thread
+        self.timer = QTimer(self)
+        self.timer.setInterval(poll_interval)
+        self.timer.timeout.connect(self._poll)
+
+    def load(self, file_path):
+        self.player.set_media(self.instance.media_new(file_path))
+        self._duration = 0
+        self.timer.start()
+
+    def _poll(self):
+        playing = bool(self.player.is_playing())
+        if playing != self._playing:
+            self._playing = playing
+            self.state_changed.emit(playing)
+        duration = self.player.get_length()
+        if duration > 0 and duration != self._duration:
+            self._duration = duration
+            self.duration_changed.emit(duration)
+        if playing:
+            self.position_changed.emit(self.position())
+        elif self.player.get_state() == self.vlc.State.Ended:
+            self.player.stop()
+            self.media_ended.emit()
+
+    def play(self):
+        self.player.play()
+
+    def pause(self):
+        self.player.set_pause(1)
+
+    def stop(self):
+        self.player.stop()
+
+    def is_playing(self):
+        return bool(self.player.is_playing())
+
+    def position(self):
+        return max(0, self.player.get_time())
+
+    def set_position(self, ms):
+        self.player.set_time(int(ms))
+        self.position_changed.emit(int(ms))
+
+    def duration(self):
+        return max(0, self.player.get_length())
+
+    def rate(self):
+        return self.player.get_rate()
+
+    def set_rate(self, rate):
+        self.player.set_rate(rate)
+
+    def set_volume(self, volume):
+        self.player.audio_set_volume(int(volume * 100))
+
+
+class QtBackend(AudioBackend):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
+        self.QMediaPlayer = QMediaPlayer
+        self.player = QMediaPlayer(self)
+        self.audio_output = QAudioOutput(self)
+        self.player.setAudioOutput(self.audio_output)
+        self.audio_output.setVolume(0.5)
+        self.player.positionChanged.connect(self.position_changed)
+        self.player.durationChanged.connect(self.duration_changed)
+        self.player.playbackStateChanged.connect(
+            lambda state: self.state_changed.emit(state == QMediaPlayer.PlayingState))
+        self.player.mediaStatusChanged.connect(self._on_media_status)
+
+    def _on_media_status(self, status):
+        if status == self.QMediaPlayer.EndOfMedia:
+            self.media_ended.emit()
+
+    def load(self, file_path):
+        self.player.setSource(QUrl.fromLocalFile(file_path))
+
+    def play(self):
+        self.player.play()
+
+    def pause(self):
+        self.player.pause()
+
+    def stop(self):
+        self.player.stop()
+
+    def is_playing(self):
+        return self.player.playbackState() == self.QMediaPlayer.PlayingState
+
+    def position(self):
+        return self.player.position()
+
+    def set_position(self, ms):
+        self.player.setPosition(int(ms))
+
+    def duration(self):
+        return self.player.duration()
+
+    def rate(self):
+        return self.player.playbackRate()
+
+    def set_rate(self, rate):
+        self.player.setPlaybackRate(rate)
+
+    def set_volume(self, volume):
+        self.audio_output.setVolume(volume)
+
+
+class SimulatedBackend(AudioBackend):
+    # A virtual clock that only moves when advance() is called, so runs are
+    # reproducible and can go as fast as the code under test allows.
+    def __init__(self, duration=0, parent=None):
+        super().__init__(parent)
+        # A fixed duration given here applies to every song; otherwise each load reads it
+        self.fixed_duration = duration
+        self._duration = duration
+        self._position = 0.0
+        self._rate = 1.0
+        self._playing = False
+        self.volume = 0.5
+        self.source = None
+
+    def load(self, file_path):
+        self.source = file_path
+        self._position = 0.0
+        if self.fixed_duration:
+            self._duration = self.fixed_duration
+        else:
+            from Library import audio_duration
+            self._duration = audio_duration(file_path) or 0
+        self.duration_changed.emit(self._duration)
+
+    def set_duration(self, ms):
+        self._duration = ms
+        self.duration_changed.emit(ms)
+
+    def advance(self, ms):
+        if not self._playing:
+            return
+        self._position += ms * self._rate
+        if self._duration and self._position >= self._duration:
+            self._position = self._duration
+            self.position_changed.emit(self.position())
+            self.pause()
+            self.media_ended.emit()
+            return
+        self.position_changed.emit(self.position())
+
+    def run(self, until_ms, step=10):
+        # Steps the clock in fixed increments of wall-clock-equivalent time
+        while self._playing and self._position < until_ms:
+            self.advance(step)
+
+    def play(self):
+        if not self._playing:
+            self._playing = True
+            self.state_changed.emit(True)
+
+    def pause(self):
+        if self._playing:
+            self._playing = False
+            self.state_changed.emit(False)
+
+    def stop(self):
+        self.pause()
+        self.set_position(0)
+
+    def is_playing(self):
+        return self._playing
+
+    def position(self):
+        return int(self._position)
+
+    def set_position(self, ms):
+        self._position = float(max(0, ms))
+        self.position_changed.emit(self.position())
+
+    def duration(self):
+        return self._duration
+
+    def rate(self):
+        return self._rate
+
+    def set_rate(self, rate):
+        self._rate = rate
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+
+BACKENDS = {
+    "vlc": VlcBackend,
+    "qt": QtBackend,
+    "sim": SimulatedBackend,
+}
+
+
+def create_backend(name="vlc", parent=None):
+    return BACKENDS[name](parent=parent)
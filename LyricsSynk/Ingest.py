@@ -0,0 +1,221 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from Lyrics import Lyrics
+from Library import LyricsLibrary, timing_coverage, lyrics_text, elrc_text
+
+TSV_ESCAPE = re.compile(r"\\(.)")
+TSV_UNESCAPES = {"n": "\n", "t": "\t", "r": "\r"}
+
+
+def decode_record(raw, fmt, fields):
+    id_field, name_field, text_field = fields
+    line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+    if not line.strip():
+        return None
+    if fmt == "jsonl":
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            return None
+        # Valid JSON that isn't a record, or lyrics that aren't text, is skipped like bad JSON
+        if not isinstance(rec, dict):
+            return None
+        text = rec.get(text_field)
+        if not text or not isinstance(text, str):
+            return None
+        key = str(rec.get(id_field, ""))
+        return key, str(rec.get(name_field) or key), text
+    cols = line.split("\t")
+    if len(cols) < 3:
+        return None
+    text = TSV_ESCAPE.sub(lambda m: TSV_UNESCAPES.get(m.group(1), m.group(1)), cols[2])
+    return cols[0], cols[1] or cols[0], text
+
+
+def parse_batch(lines, fmt, fields, with_elrc=False):
+    # Runs in a worker process; only plain tuples go back over the pipe
+    out = []
+    for raw in lines:
+        rec = decode_record(raw, fmt, fields)
+        if rec is None:
+            continue
+        key, name, text = rec
+        try:
+            lyrics = Lyrics(text)
+        except (ValueError, IndexError):
+            continue
+        elrc = elrc_text(lyrics) if with_elrc else None
+        out.append((key, name, timing_coverage(lyrics), lyrics_text(lyrics), elrc))
+    return out
+
+
+def read_batches(path, offset, batch_size):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        batch = []
+        for raw in f:
+            offset += len(raw)
+            batch.append(raw)
+            if len(batch) >= batch_size:
+                yield batch, offset
+                batch = []
+        if batch:
+            yield batch, offset
+
+
+class LibrarySink:
+    # Ingested rows have no file of their own; the app opens them from the indexed text
+    wants_elrc = False
+
+    def __init__(self, db_path, source):
+        self.library = LyricsLibrary(db_path)
+        self.source = source
+        self.conn = self.library.conn
+        self.conn.execute("CREATE TABLE IF NOT EXISTS ingest_checkpoints (source TEXT PRIMARY KEY, offset INTEGER)")
+        self.conn.commit()
+
+    def checkpoint(self):
+        row = self.conn.execute("SELECT offset FROM ingest_checkpoints WHERE source = ?", (self.source,)).fetchone()
+        return row[0] if row else 0
+
+    def write(self, records):
+        for key, name, coverage, text, _ in records:
+            self.library.add_record(f"{self.source}#{key}", None, name, None, coverage, None, text)
+
+    def commit(self, offset):
+        # The checkpoint lands in the same transaction as the rows it covers
+        self.conn.execute("INSERT OR REPLACE INTO ingest_checkpoints (source, offset) VALUES (?, ?)",
+                          (self.source, offset))
+        self.conn.commit()
+
+    def close(self):
+        self.library.close()
+
+
+class ElrcTreeSink:
+    wants_elrc = True
+
+    def __init__(self, out_dir, source):
+        self.out_dir = out_dir
+        self.source = source
+        self.checkpoint_path = os.path.join(out_dir, ".ingest_checkpoint.json")
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _load_checkpoints(self):
+        if not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def checkpoint(self):
+        return self._load_checkpoints().get(self.source, 0)
+
+    def write(self, records):
+        for key, _, _, _, elrc in records:
+            safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in key)[:80] or "record"
+            # Keys that sanitize alike ("a/b", "a_b") still get their own file
+            name = f"{safe}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}"
+            shard = os.path.join(self.out_dir, name[:2])
+            os.makedirs(shard, exist_ok=True)
+            with open(os.path.join(shard, name + ".elrc"), "w", encoding="utf-8") as f:
+                f.write(elrc)
+
+    def commit(self, offset):
+        checkpoints = self._load_checkpoints()
+        checkpoints[self.source] = offset
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(checkpoints, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def close(self):
+        pass
+
+
+def ingest(path, sink, fmt=None, fields=("id", "title", "lyrics"), workers=None,
+           batch_size=500, commit_every=8, progress=sys.stderr):
+    if fmt is None:
+        fmt = "tsv" if path.lower().endswith((".tsv", ".tab")) else "jsonl"
+    workers = workers or os.cpu_count() or 1
+    total_size = os.path.getsize(path)
+    start_offset = sink.checkpoint()
+    offset = start_offset
+    records = 0
+    pending_batches = 0
+    start = time.perf_counter()
+
+    def report():
+        elapsed = max(time.perf_counter() - start, 1e-6)
+        mb = (offset - start_offset) / 1e6
+        print(f"\r{offset * 100.0 / max(total_size, 1):5.1f}%  {records} records  "
+              f"{records / elapsed:.0f} rec/s  {mb / elapsed:.1f} MB/s", end="", file=progress)
+
+    # At most max_in_flight batches are queued, so memory stays flat however large the dump is
+    max_in_flight = workers * 2
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        batches = read_batches(path, start_offset, batch_size)
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < max_in_flight:
+                try:
+                    lines, end = next(batches)
+                except StopIteration:
+                    exhausted = True
+                    break
+                in_flight.append((pool.submit(parse_batch, lines, fmt, fields, sink.wants_elrc), end))
+            if not in_flight:
+                break
+            future, end = in_flight.popleft()
+            parsed = future.result()
+            sink.write(parsed)
+            records += len(parsed)
+            offset = end
+            pending_batches += 1
+            if pending_batches >= commit_every:
+                sink.commit(offset)
+                pending_batches = 0
+                if progress:
+                    report()
+    sink.commit(offset)
+    if progress:
+        report()
+        print(file=progress)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a JSONL/TSV lyrics dump into the library")
+    parser.add_argument("dump")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--db", default="library.db")
+    target.add_argument("--out-dir", help="write an .elrc tree instead of the library index")
+    parser.add_argument("--format", choices=("jsonl", "tsv"))
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--name-field", default="title")
+    parser.add_argument("--text-field", default="lyrics")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    args = parser.parse_args(argv)
+
+    source = os.path.abspath(args.dump)
+    sink = ElrcTreeSink(args.out_dir, source) if args.out_dir else LibrarySink(args.db, source)
+    if args.restart:
+        sink.commit(0)
+    try:
+        ingest(args.dump, sink, args.format, (args.id_field, args.name_field, args.text_field),
+               args.workers, args.batch_size)
+    finally:
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+from bisect import bisect_left, bisect_right
+
+
+class _Node:
+    __slots__ = ("center", "starts", "by_start", "neg_ends", "by_end", "left", "right")
+
+
+class IntervalTree:
+    # Static centred interval tree over half-open [start, end) intervals.
+    # at() and overlapping() run in O(log n + k).
+    def __init__(self, intervals):
+        self.size = 0
+        self.root = self._build([iv for iv in intervals if iv[1] > iv[0]])
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        # The median start point always lies inside at least one interval
+        starts = sorted(iv[0] for iv in intervals)
+        center = starts[len(starts) // 2]
+        left = []
+        right = []
+        here = []
+        for iv in intervals:
+            if iv[1] <= center:
+                left.append(iv)
+            elif iv[0] > center:
+                right.append(iv)
+            else:
+                here.append(iv)
+        return self._make_node(center, left, here, right)
+
+    def _make_node(self, center, left, here, right):
+        node = _Node()
+        node.center = center
+        node.by_start = sorted(here, key=lambda iv: iv[0])
+        node.starts = [iv[0] for iv in node.by_start]
+        node.by_end = sorted(here, key=lambda iv: -iv[1])
+        node.neg_ends = [-iv[1] for iv in node.by_end]
+        self.size += len(here)
+        node.left = self._build(left)
+        node.right = self._build(right)
+        return node
+
+    def __len__(self):
+        return self.size
+
+    def at(self, t):
+        # Data of every interval with start <= t < end
+        out = []
+        node = self.root
+        while node is not None:
+            if t < node.center:
+                out.extend(iv[2] for iv in node.by_start[:bisect_right(node.starts, t)])
+                node = node.left
+            elif t > node.center:
+                out.extend(iv[2] for iv in node.by_end[:bisect_left(node.neg_ends, -t)])
+                node = node.right
+            else:
+                out.extend(iv[2] for iv in node.by_start)
+                break
+        return out
+
+    def overlapping(self, t0, t1):
+        # Data of every interval that overlaps [t0, t1]
+        out = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if t1 < node.center:
+                out.extend(iv[2] for iv in node.by_start[:bisect_right(node.starts, t1)])
+                stack.append(node.left)
+            elif t0 > node.center:
+                out.extend(iv[2] for iv in node.by_end[:bisect_left(node.neg_ends, -t0)])
+                stack.append(node.right)
+            else:
+                out.extend(iv[2] for iv in node.by_start)
+                stack.append(node.left)
+                stack.append(node.right)
+        return out
@@ -0,0 +1,249 @@
+import os
+import sqlite3
+import sys
+import time
+import wave
+import argparse
+from Lyrics import Lyrics
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".m4a")
+LYRICS_EXTENSIONS = (".lrc", ".elrc", ".txt")
+
+
+def audio_duration(path):
+    # Duration in ms, or None when it can't be read without decoding the file
+    try:
+        import mutagen
+    except ImportError:
+        mutagen = None
+    try:
+        if mutagen is not None:
+            info = mutagen.File(path)
+            if info is not None and info.info is not None:
+                return int(info.info.length * 1000)
+        if path.lower().endswith(".wav"):
+            with wave.open(path, "rb") as f:
+                return int(f.getnframes() * 1000 / f.getframerate())
+    except Exception:
+        return None
+    return None
+
+
+def timing_coverage(lyrics):
+    total = 0
+    timed = 0
+    for ln in lyrics.lines:
+        for w in ln.words:
+            total += 1
+            if w.start_time is not None and w.end_time is not None:
+                timed += 1
+    if total == 0:
+        return 0.0
+    return timed * 100.0 / total
+
+
+def lyrics_text(lyrics):
+    return "\n".join(" ".join(w.word for w in ln.words) for ln in lyrics.lines)
+
+
+def _format_time(ms):
+    return f"{ms // 60000:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+
+def elrc_text(lyrics):
+    # Same layout the editor writes, so an exported file opens like a saved one
+    out = []
+    for ln in lyrics.lines:
+        line_txt = ""
+        if ln.start_time is not None:
+            line_txt += f"[{_format_time(ln.start_time)}]"
+        if ln.voice != "v1":
+            line_txt += f"{ln.voice}: "
+        for w in ln.words:
+            if w.start_time is not None and w.end_time is not None:
+                line_txt += f"<{_format_time(w.start_time)}>{w.word} <{_format_time(w.end_time)}>"
+            else:
+                line_txt += f"{w.word} "
+        out.append(line_txt.strip())
+    return "\n".join(out)
+
+
+def find_phrase(lyrics, phrase):
+    # Returns (line_idx, word_idx) of the first word of the phrase
+    tokens = [_normalize_token(t) for t in phrase.split()]
+    tokens = [t for t in tokens if t]
+    if not tokens:
+        return None
+    words = []
+    for i, ln in enumerate(lyrics.lines):
+        for j, w in enumerate(ln.words):
+            words.append((i, j, _normalize_token(w.word)))
+    for k in range(len(words) - len(tokens) + 1):
+        if all(words[k + n][2] == t for n, t in enumerate(tokens)):
+            return words[k][0], words[k][1]
+    for i, j, token in words:
+        if token.startswith(tokens[0]):
+            return i, j
+    return None
+
+
+def _normalize_token(token):
+    return "".join(c for c in token.lower() if c.isalnum())
+
+
+class LyricsLibrary:
+    def __init__(self, db_path="library.db"):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS songs (
+                id INTEGER PRIMARY KEY,
+                lyrics_path TEXT UNIQUE NOT NULL,
+                song_path TEXT,
+                song_name TEXT,
+                duration INTEGER,
+                coverage REAL,
+                mtime REAL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS lyrics_fts USING fts5(
+                text, tokenize = 'unicode61 remove_diacritics 2'
+            );
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def scan(self, lyrics_dir, audio_dir=None):
+        audio_index = self._index_audio(audio_dir or lyrics_dir)
+        known = {row["lyrics_path"]: (row["id"], row["mtime"])
+                 for row in self.conn.execute("SELECT id, lyrics_path, mtime FROM songs")}
+        seen = set()
+        updated = 0
+        # Trailing separator, so scanning /music/lyrics leaves /music/lyrics2 alone
+        scanned_root = os.path.join(os.path.abspath(lyrics_dir), "")
+        with self.conn:
+            for root, _, files in os.walk(lyrics_dir):
+                for name in files:
+                    if not name.lower().endswith(LYRICS_EXTENSIONS):
+                        continue
+                    path = os.path.abspath(os.path.join(root, name))
+                    seen.add(path)
+                    mtime = os.path.getmtime(path)
+                    if path in known and known[path][1] == mtime:
+                        continue
+                    stem = os.path.splitext(name)[0].lower()
+                    if self.add(path, audio_index.get(stem), mtime) is not None:
+                        updated += 1
+            removed = [song_id for path, (song_id, _) in known.items()
+                       if path not in seen and path.startswith(scanned_root)]
+            for song_id in removed:
+                self._delete(song_id)
+        return updated, len(removed)
+
+    def add(self, lyrics_path, song_path=None, mtime=None, text=None):
+        if text is None:
+            try:
+                with open(lyrics_path, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except (OSError, UnicodeDecodeError):
+                return None
+        try:
+            lyrics = Lyrics(text)
+        except (ValueError, IndexError):
+            return None
+        return self.add_lyrics(lyrics, lyrics_path, song_path, mtime)
+
+    def add_lyrics(self, lyrics, lyrics_path, song_path=None, mtime=None):
+        duration = audio_duration(song_path) if song_path else None
+        return self.add_record(lyrics_path, song_path, os.path.basename(lyrics_path), duration,
+                               timing_coverage(lyrics), mtime, lyrics_text(lyrics))
+
+    def add_record(self, lyrics_path, song_path, song_name, duration, coverage, mtime, text):
+        row = self.conn.execute("SELECT id FROM songs WHERE lyrics_path = ?", (lyrics_path,)).fetchone()
+        if row:
+            song_id = row["id"]
+            self.conn.execute(
+                "UPDATE songs SET song_path = ?, song_name = ?, duration = ?, coverage = ?, mtime = ? WHERE id = ?",
+                (song_path, song_name, duration, coverage, mtime, song_id))
+            self.conn.execute("DELETE FROM lyrics_fts WHERE rowid = ?", (song_id,))
+        else:
+            song_id = self.conn.execute(
+                "INSERT INTO songs (lyrics_path, song_path, song_name, duration, coverage, mtime) VALUES (?, ?, ?, ?, ?, ?)",
+                (lyrics_path, song_path, song_name, duration, coverage, mtime)).lastrowid
+        self.conn.execute("INSERT INTO lyrics_fts (rowid, text) VALUES (?, ?)", (song_id, text))
+        return song_id
+
+    def _delete(self, song_id):
+        self.conn.execute("DELETE FROM lyrics_fts WHERE rowid = ?", (song_id,))
+        self.conn.execute("DELETE FROM songs WHERE id = ?", (song_id,))
+
+    def _index_audio(self, audio_dir):
+        index = {}
+        if not audio_dir or not os.path.isdir(audio_dir):
+            return index
+        for root, _, files in os.walk(audio_dir):
+            for name in files:
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    index.setdefault(os.path.splitext(name)[0].lower(), os.path.abspath(os.path.join(root, name)))
+        return index
+
+    def search(self, phrase, limit=50):
+        if not phrase.strip():
+            return []
+        query = '"' + phrase.replace('"', '""') + '"'
+        return self.conn.execute("""
+            SELECT songs.*, replace(snippet(lyrics_fts, 0, '[', ']', '...', 8), char(10), ' / ') AS snippet
+            FROM lyrics_fts JOIN songs ON songs.id = lyrics_fts.rowid
+            WHERE lyrics_fts MATCH ?
+            ORDER BY rank LIMIT ?
+        """, (query, limit)).fetchall()
+
+    def indexed_lyrics(self, lyrics_path):
+        # song_name and searchable text of a row; rows from Ingest ("dump.jsonl#key")
+        # have no lyrics file, so this is all there is to open
+        return self.conn.execute("""
+            SELECT songs.song_name, lyrics_fts.text
+            FROM songs JOIN lyrics_fts ON lyrics_fts.rowid = songs.id
+            WHERE songs.lyrics_path = ?
+        """, (lyrics_path,)).fetchone()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM songs").fetchone()[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LyricsSynk song/lyrics library")
+    parser.add_argument("--db", default="library.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+    scan_parser = sub.add_parser("scan")
+    scan_parser.add_argument("lyrics_dir")
+    scan_parser.add_argument("--audio-dir")
+    search_parser = sub.add_parser("search")
+    search_parser.add_argument("phrase")
+    search_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    library = LyricsLibrary(args.db)
+    start = time.perf_counter()
+    if args.command == "scan":
+        updated, removed = library.scan(args.lyrics_dir, args.audio_dir)
+        print(f"{updated} updated, {removed} removed, {library.count()} total "
+              f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    else:
+        rows = library.search(args.phrase, args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        for row in rows:
+            print(f"{row['song_name']}\t{row['coverage']:.0f}%\t{row['snippet']}")
+        print(f"{len(rows)} results in {elapsed:.1f} ms", file=sys.stderr)
+    library.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,27 @@
+import re
+import sys
+from collections.abc import Sequence
+from IntervalTree import IntervalTree
+
+VOICE_TAGS = ("v1", "v2", "bg")
+LINE_TIME = re.compile(r"\s*\[(?P<min>\d+):(?P<sec>\d{1,2})(?:[.:](?P<frac>\d{1,3}))?\]")
+# A word tag, a damaged tag (dropped), or a word
+WORD_ITEM = re.compile(r"<(?P<min>\d+):(?P<sec>\d{1,2})(?:[.:](?P<frac>\d{1,3}))?>|<[\d:.]*>?|(?P<word>[^\s<]+)")
+
+
+def _ms(m):
+    ms = (int(m.group("min")) * 60 + int(m.group("sec"))) * 1000
+    if m.group("frac"):
+        ms += int(m.group("frac").ljust(3, "0"))
+    return ms
+
+
 class LyricsWord:
+    __slots__ = ("word", "line_start_time", "start_time", "end_time", "word_box")
+
     def __init__(self, word, line_start_time):
-        self.word = word
+        # Interned, so repeated words (choruses) share one string across songs
+        self.word = sys.intern(word)
         self.line_start_time = line_start_time
         self.start_time = None
         self.end_time = None
@@ -8,61 +29,140 @@ class LyricsWord:
 
 
 class LyricsLine:
+    # The raw line text is only used while parsing and is not kept.
+    # LyricsSynk2 subclasses the model and swaps in its own word/line types.
+    word_class = LyricsWord
+    __slots__ = ("start_time", "end_time", "hbox", "words", "words_length", "is_empty",
+                 "voice", "is_voice_1", "is_voice_2", "is_background_voice")
+
     def __init__(self, line):
         self.start_time = None
+        self.end_time = None
         self.hbox = None
         self.words = []
-        self.words_with_time = line
+        self.words_length = 0
         self.is_empty = False
+        self.voice = "v1"
         self.is_voice_1 = True
         self.is_voice_2 = False
         self.is_background_voice = False
-        if len(self.words_with_time.split("]")) > 1 :
-            words_with_time_split = self.words_with_time.split("]")
-            if words_with_time_split[1] == "" or words_with_time_split[1] == " ":
+        words_with_time = line
+        m = LINE_TIME.match(words_with_time)
+        if m:
+            if not words_with_time[m.end():].strip():
                 self.is_empty = True
                 return
-            start_time_string = words_with_time_split[0][1:]
-            self.start_time = ((int(start_time_string[0:1])*60)+int(start_time_string[4:5]))*1000 + int(start_time_string[6:])
-            self.words_with_time = words_with_time_split[1]
-        if len(self.words_with_time.split(">")) > 1:
-            syllable_words = self.words_with_time.split(" ")
-            for i,w in enumerate(syllable_words):
-                if i == 0:
-                    word_start_time, word = w.split(">")
-                else:
-                    prev_end_time, word_start_time, word = w.split(">")
-                    self.words[i-1].end_time = ((int(prev_end_time[1:2])*60)+int(prev_end_time[5:6]))*1000 + int(prev_end_time[7:])
-                self.words.append(LyricsWord(word, self.start_time))
-                self.words[i].start_time = ((int(word_start_time[1:2])*60)+int(word_start_time[5:6]))*1000 + int(word_start_time[7:])
-
-        elif self.words_with_time.strip():
-            for i, w in enumerate(self.words_with_time.split()):
+            self.start_time = _ms(m)
+            words_with_time = words_with_time[m.end():]
+        words_with_time = self._parse_voice(words_with_time)
+        if ">" in words_with_time:
+            self._parse_syllables(words_with_time)
+        elif words_with_time.strip():
+            for i, w in enumerate(words_with_time.split()):
                 if w.strip():
-                    self.words.append(LyricsWord(w, self.start_time))
-        self.end_time = None
+                    self.words.append(self.word_class(w, self.start_time))
         self.words_length = len(self.words)
 
+    def _parse_syllables(self, text):
+        # "<start>word <end><start>word <end>": a tag touching a word starts it when
+        # that word is followed by its own end tag (or nothing is left open before
+        # it); otherwise the tag ends the previous word. Damaged tags are dropped,
+        # leaving those words untimed rather than failing the whole line.
+        items = list(WORD_ITEM.finditer(text))
+        open_word = None
+        k = 0
+        while k < len(items):
+            m = items[k]
+            k += 1
+            if m.group("word"):
+                open_word = self.word_class(m.group("word"), self.start_time)
+                self.words.append(open_word)
+            elif m.group("min"):
+                nxt = items[k] if k < len(items) else None
+                after = items[k + 1] if k + 1 < len(items) else None
+                touching = nxt is not None and nxt.group("word") and nxt.start() == m.end()
+                if touching and (open_word is None or (after is not None and not after.group("word"))):
+                    open_word = self.word_class(nxt.group("word"), self.start_time)
+                    open_word.start_time = _ms(m)
+                    self.words.append(open_word)
+                    k += 1
+                elif open_word is not None:
+                    open_word.end_time = _ms(m)
+                    open_word = None
+            else:
+                open_word = None
+
+    def _parse_voice(self, text):
+        # Enhanced LRC voice prefix: "v1:", "v2:" or "bg:" right after the line timestamp
+        tag, sep, rest = text.lstrip().partition(":")
+        if not sep or tag.lower() not in VOICE_TAGS:
+            return text
+        self.voice = tag.lower()
+        self.is_voice_1 = self.voice == "v1"
+        self.is_voice_2 = self.voice == "v2"
+        self.is_background_voice = self.voice == "bg"
+        return rest.lstrip()
+
     def toarray(self):
         return self.words
 
 
+class WordsView(Sequence):
+    # What toarray() returns: each line's word list, read straight from the lines
+    __slots__ = ("lines",)
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [ln.words for ln in self.lines[i]]
+        return self.lines[i].words
+
+
 class Lyrics:
+    line_class = LyricsLine
+
     def __init__(self, lyrics):
-        self.return_string = []
         self.vbox = None
-        self.lines_with_time = lyrics.split("\n")
         self.lines = []
         self.lyricsPath = ""
         self.songName = ""
-        for ln in self.lines_with_time:
+        # Only the parsed lines are kept, not the source text
+        for ln in lyrics.split("\n"):
             if ln.strip():
-                lyrics_line = LyricsLine(ln)
+                lyrics_line = self.line_class(ln)
                 if not lyrics_line.is_empty:
-                    self.lines.append(LyricsLine(ln))
+                    self.lines.append(lyrics_line)
+
+    def word_intervals(self, voice=None):
+        # An untimed word end falls back to the next start in the same voice
+        next_line_start = {}
+        line_ends = [None] * len(self.lines)
+        for i in range(len(self.lines) - 1, -1, -1):
+            ln = self.lines[i]
+            line_ends[i] = ln.end_time if ln.end_time is not None else next_line_start.get(ln.voice)
+            start = next((w.start_time for w in ln.words if w.start_time is not None), ln.start_time)
+            if start is not None:
+                next_line_start[ln.voice] = start
+        for i, ln in enumerate(self.lines):
+            if voice is not None and ln.voice != voice:
+                continue
+            timed = [(j, w) for j, w in enumerate(ln.words) if w.start_time is not None]
+            for k, (j, w) in enumerate(timed):
+                end = w.end_time
+                if end is None:
+                    end = timed[k + 1][1].start_time if k + 1 < len(timed) else line_ends[i]
+                if end is None or end <= w.start_time:
+                    end = w.start_time + 1
+                yield w.start_time, end, (i, j)
+
+    def timing_tree(self, voice=None):
+        # Answers "which words are active at t" across overlapping voices
+        return IntervalTree(self.word_intervals(voice))
 
     def toarray(self):
-        self.return_string = []
-        for ln in self.lines:
-            self.return_string.append(ln.toarray())
-        return self.return_string
\ No newline at end of file
+        return WordsView(self.lines)
@@ -0,0 +1,63 @@
+import sys
+import argparse
+import tracemalloc
+from Lyrics import Lyrics
+from Library import LYRICS_EXTENSIONS
+from Pairing import scan_files
+
+
+def measure(paths, with_tree=False):
+    # Songs stay resident as they are loaded, like a set list held in memory,
+    # so words shared with earlier songs cost nothing extra.
+    resident = []
+    rows = []
+    tracemalloc.start()
+    try:
+        for path in paths:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                text = f.read()
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            lyrics = Lyrics(text)
+            tree = lyrics.timing_tree() if with_tree else None
+            current, peak = tracemalloc.get_traced_memory()
+            resident.append((lyrics, tree))
+            words = sum(len(ln.words) for ln in lyrics.lines)
+            rows.append((path, len(text.encode("utf-8")), len(lyrics.lines), words, current - before, peak - before))
+    finally:
+        tracemalloc.stop()
+    return rows
+
+
+def _kib(n):
+    return f"{n / 1024:.1f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the resident memory of parsed lyrics per song")
+    parser.add_argument("paths", nargs="+", help="lyrics files or directories")
+    parser.add_argument("--tree", action="store_true", help="include each song's timing tree")
+    parser.add_argument("--setlist", type=int, default=500, help="project the total for this many songs")
+    parser.add_argument("--quiet", action="store_true", help="only print the totals")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for p in args.paths:
+        paths.extend(sorted(scan_files(p, LYRICS_EXTENSIONS)) if not p.lower().endswith(LYRICS_EXTENSIONS) else [p])
+    if not paths:
+        print("no lyrics files found", file=sys.stderr)
+        return
+    rows = measure(paths, args.tree)
+
+    if not args.quiet:
+        print(f"{'file KiB':>9}{'lines':>7}{'words':>7}{'resident KiB':>14}{'peak KiB':>10}  song")
+        for path, size, lines, words, resident, peak in rows:
+            print(f"{_kib(size):>9}{lines:>7}{words:>7}{_kib(resident):>14}{_kib(peak):>10}  {path}")
+    total = sum(r[4] for r in rows)
+    average = total / len(rows)
+    print(f"{len(rows)} songs: {_kib(total)} KiB resident, {_kib(average)} KiB per song, "
+          f"~{average * args.setlist / 1024 / 1024:.1f} MiB for {args.setlist} songs")
+
+
+if __name__ == "__main__":
+    main()
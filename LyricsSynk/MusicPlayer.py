@@ -1,27 +1,35 @@
-import vlc
+import os
 from Lyrics import Lyrics
-from Widgets import LyricsWidget, EditorWidget
+from Align import carry_timings
+from Library import LyricsLibrary, find_phrase
+from Pairing import load_manifest
+from Widgets import LyricsWidget, EditorWidget, LibraryWidget, KaraokeWidget
 from PySide6.QtWidgets import (
     QMainWindow, QPushButton, QVBoxLayout, QWidget,
-    QFileDialog, QHBoxLayout, QStackedWidget
+    QFileDialog, QHBoxLayout, QStackedWidget, QDockWidget, QMessageBox, QLabel
 )
+from PySide6.QtCore import Qt
 
 class MusicPlayer(QMainWindow):
-    def __init__(self):
+    def __init__(self, backend="vlc"):
         super().__init__()
         self.lyrics = Lyrics("")
         self.setWindowTitle("Music Player")
         self.setBaseSize(500, 500)
         self.lineReached = 0
         self.wordReached = 0
-        self.vlc_instance = vlc.Instance()
-        self.player = self.vlc_instance.media_player_new()
-        self.player.audio_set_volume(50)
+        self.pairings = {}
+        self.backend = backend
+        self.player = None
+        self.sync_server = None
+        self.library = None
+        self.library_dock = None
         central = QWidget()
         self.setCentralWidget(central)
         self.stack = QStackedWidget()
         self.lyrics_widget = None
         self.editor_widget = None
+        self.karaoke_widget = None
         outer = QVBoxLayout(central)
         outer.addWidget(self.stack)
 
@@ -30,42 +38,195 @@ class MusicPlayer(QMainWindow):
         self.switch_to_editor_btn = QPushButton("Editor")
         self.switch_to_boxes_btn.clicked.connect(lambda: self.apply_lyrics_from_editor())
         self.switch_to_editor_btn.clicked.connect(lambda: self.stack.setCurrentIndex(1))
+        self.switch_to_karaoke_btn = QPushButton("Karaoke")
+        self.switch_to_karaoke_btn.clicked.connect(self.show_karaoke)
         nav.addWidget(self.switch_to_boxes_btn)
         nav.addWidget(self.switch_to_editor_btn)
+        nav.addWidget(self.switch_to_karaoke_btn)
         outer.addLayout(nav)
 
+        self.library_btn = QPushButton("Library")
+        self.library_btn.clicked.connect(self.toggle_library)
+        nav.addWidget(self.library_btn)
+        self.sync_btn = QPushButton("Stage Sync")
+        self.sync_btn.setCheckable(True)
+        self.sync_btn.toggled.connect(self.toggle_sync_server)
+        nav.addWidget(self.sync_btn)
+
+        # Lyrics files and the audio pairing manifest from Pairing.py
+        files = QHBoxLayout()
+        self.load_lyrics_btn = QPushButton("Load Lyrics File")
+        self.load_lyrics_btn.clicked.connect(self.load_lyrics_from_file)
+        self.load_pairings_btn = QPushButton("Load Pairings")
+        self.load_pairings_btn.clicked.connect(self.load_pairing_manifest_dialog)
+        files.addWidget(self.load_lyrics_btn)
+        files.addWidget(self.load_pairings_btn)
+        outer.addLayout(files)
+
+        # File label and Play/Pause button
+        self.label = QLabel("No file loaded")
+        self.label.setAlignment(Qt.AlignCenter)
+        outer.addWidget(self.label)
+        self.play_btn = QPushButton("Play")
+        self.play_btn.setEnabled(False)
+        self.play_btn.clicked.connect(self.toggle_playback)
+        outer.addWidget(self.play_btn)
+
+    def _ensure_player(self):
+        # The audio backend (and libvlc/QtMultimedia behind it) is created on the first song load
+        if self.player is None:
+            from AudioBackend import create_backend
+            self.player = create_backend(self.backend, self) if isinstance(self.backend, str) else self.backend
+            self.player.position_changed.connect(self._on_position_changed)
+            self.player.state_changed.connect(self._on_state_changed)
+        return self.player
+
+    def toggle_playback(self):
+        if self.player:
+            self.player.toggle()
+
+    def _on_state_changed(self, playing):
+        self.play_btn.setText("Pause" if playing else "Play")
+
+    def _on_position_changed(self, position):
+        if self.lyrics_widget:
+            self.lyrics_widget.highlight_at(position)
+        if self.sync_server:
+            self.sync_server.update(position, self.player.rate())
+
+    def toggle_sync_server(self, enabled, port=8765):
+        if enabled and self.sync_server is None:
+            from SyncServer import SyncServer
+            server = SyncServer(port=port)
+            server.set_lyrics(self.lyrics)
+            try:
+                server.start()
+            except (OSError, TimeoutError) as e:
+                self.sync_btn.setChecked(False)
+                QMessageBox.warning(self, "Stage Sync", f"Could not start the sync server on port {port}:\n{e}")
+                return
+            self.sync_server = server
+        elif not enabled and self.sync_server is not None:
+            self.sync_server.stop()
+            self.sync_server = None
+
+    def position(self):
+        return self.player.position() if self.player else 0
+
+    def is_playing(self):
+        return bool(self.player and self.player.is_playing())
+
+    def rate(self):
+        return self.player.rate() if self.player else 1.0
+
+    def toggle_library(self):
+        if self.library_dock is None:
+            self.library = LyricsLibrary()
+            self.library_dock = QDockWidget("Library", self)
+            self.library_dock.setWidget(LibraryWidget(self.library, self))
+            self.addDockWidget(Qt.RightDockWidgetArea, self.library_dock)
+            return
+        self.library_dock.setVisible(not self.library_dock.isVisible())
+
+    def show_karaoke(self):
+        if self.karaoke_widget is None:
+            self.karaoke_widget = KaraokeWidget(self.lyrics, self.position, self.is_playing, self.rate, self)
+            self.stack.insertWidget(2, self.karaoke_widget)
+        self.stack.setCurrentWidget(self.karaoke_widget)
+
     def load_song(self, file_path):
         if file_path:
-            media = self.vlc_instance.media_new(file_path)
-            self.player.set_media(media)
+            self._ensure_player().load(file_path)
             self.label.setText(file_path.split("/")[-1])
             self.play_btn.setEnabled(True)
             self.play_btn.setText("Play")
 
     def load_lyrics_from_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "Open Lyrics", "", "Text Files (*.txt *.lrc)"
+            self, "Open Lyrics", "", "Text Files (*.txt *.lrc *.elrc)"
         )
         if file_path:
-            with open(file_path, "r", encoding="utf-8") as f:
-                self.lyrics = Lyrics(f.read())
-                self.lyrics.songName = file_path.split("/")[-1]
-            self.lyrics_string = self.lyrics.toarray()
-            self.lyrics_widget = LyricsWidget(self.lyrics, self)
-            self.editor_widget = EditorWidget(self.lyrics, self) # Todo: Make editorwidget always visible. make it update the lyrics objects when you switch back to lyrics widget.
-            self.stack.addWidget(self.lyrics_widget)
-            self.stack.addWidget(self.editor_widget)
-            self.stack.setCurrentIndex(0)
+            self.load_lyrics(file_path)
+
+    def load_pairing_manifest_dialog(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Open Pairing Manifest", "", "Pairing Manifests (*.json)"
+        )
+        if not file_path:
+            return
+        try:
+            self.load_pairing_manifest(file_path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            QMessageBox.warning(self, "Load Pairings", f"Could not read {file_path}:\n{e}")
+            return
+        self.load_pairings_btn.setText(f"Pairings: {len(self.pairings)}")
+
+    def load_pairing_manifest(self, manifest_path):
+        self.pairings = load_manifest(manifest_path)
+
+    def load_lyrics(self, file_path):
+        song_path = self.pairings.get(os.path.abspath(file_path))
+        if song_path:
+            self.load_song(song_path)
+        with open(file_path, "r", encoding="utf-8") as f:
+            text = f.read()
+        self.show_lyrics(text, file_path.split("/")[-1])
+
+    def show_lyrics(self, text, song_name):
+        self.lyrics = Lyrics(text)
+        self.lyrics.songName = song_name
+        self.lineReached = 0
+        self.wordReached = 0
+        self._replace_widgets() # Todo: Make editorwidget always visible. make it update the lyrics objects when you switch back to lyrics widget.
+        self.stack.setCurrentIndex(0)
+
+    def open_library_hit(self, lyrics_path, song_path, phrase):
+        if song_path:
+            self.load_song(song_path)
+        if os.path.exists(lyrics_path):
+            self.load_lyrics(lyrics_path)
+        else:
+            row = self.library.indexed_lyrics(lyrics_path)
+            if row is None:
+                return
+            # Ingested dump records open untimed, from the text the index kept
+            self.show_lyrics(row["text"], row["song_name"].replace(os.sep, "_"))
+        hit = find_phrase(self.lyrics, phrase)
+        if hit is None:
+            return
+        line_idx, word_idx = hit
+        word = self.lyrics.lines[line_idx].words[word_idx]
+        if word.start_time is not None:
+            self.jump_to_word(word)
+        self.lyrics_widget.select_word(line_idx, word_idx)
 
     def apply_lyrics_from_editor(self):
-        text = self.editor_widget.text.toPlainText()
+        text = self.editor_widget.plain_text()
+        old_lyrics = self.lyrics
         self.lyrics = Lyrics(text)
-        self.lyrics_string = self.lyrics.toarray()
+        # Words whose tags were damaged or dropped in the edit keep their old timings
+        carry_timings(old_lyrics, self.lyrics)
 
         # Store current position
         current_line = self.lineReached
         current_word = self.wordReached
 
+        self._replace_widgets()
+
+        # Restore position (within bounds)
+        if current_line >= len(self.lyrics.lines):
+            current_line = len(self.lyrics.lines) - 1
+        if current_line >= 0:
+            if current_word >= len(self.lyrics.lines[current_line].words):
+                current_word = len(self.lyrics.lines[current_line].words) - 1
+            if current_word >= 0:
+                self.lyrics_widget.select_word(current_line, current_word)
+
+        self.lineReached = current_line
+        self.wordReached = current_word
+        self.stack.setCurrentIndex(0)
+
+    def _replace_widgets(self):
         # Remove old widgets
         if self.lyrics_widget:
             self.stack.removeWidget(self.lyrics_widget)
@@ -73,8 +234,12 @@ class MusicPlayer(QMainWindow):
         if self.editor_widget:
             self.stack.removeWidget(self.editor_widget)
             self.editor_widget.deleteLater()
+        if self.karaoke_widget:
+            self.stack.removeWidget(self.karaoke_widget)
+            self.karaoke_widget.deleteLater()
+            self.karaoke_widget = None
 
-        # Create new widgets
+        # Create new widgets; the karaoke view is built when first shown
         self.lyrics_widget = LyricsWidget(self.lyrics, self)
         self.editor_widget = EditorWidget(self.lyrics, self)
 
@@ -82,22 +247,13 @@ class MusicPlayer(QMainWindow):
         self.stack.insertWidget(0, self.lyrics_widget)
         self.stack.insertWidget(1, self.editor_widget)
 
-        # Restore position (within bounds)
-        if current_line >= len(self.lyrics.lines):
-            current_line = len(self.lyrics.lines) - 1
-        if current_line >= 0:
-            if current_word >= len(self.lyrics.lines[current_line].words):
-                current_word = len(self.lyrics.lines[current_line].words) - 1
-            if current_word >= 0:
-                self.lyrics_widget.select_word(current_line, current_word)
-
-        self.lineReached = current_line
-        self.wordReached = current_word
-        self.stack.setCurrentIndex(0)
+        if self.sync_server:
+            self.sync_server.set_lyrics(self.lyrics)
 
     def jump_to_word(self, word):
         if word.start_time is not None:
-            self.player.set_time(word.start_time)
+            if self.player:
+                self.player.set_position(word.start_time)
             for ln in self.lyrics.lines:
                 for w in ln.words:
                     if w.word_box and w.word_box.isChecked():
@@ -116,4 +272,4 @@ class MusicPlayer(QMainWindow):
     def save_lyrics(self):
         saved_lyrics = self.lyrics.songName + ".elrc"
         with open(saved_lyrics, "w", encoding="utf-8") as f:
-            f.write(self.editor_widget.text.toPlainText())
+            f.write(self.editor_widget.plain_text())
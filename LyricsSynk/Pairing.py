@@ -0,0 +1,175 @@
+import os
+import re
+import sys
+import json
+import time
+import bisect
+import argparse
+from difflib import SequenceMatcher
+from concurrent.futures import ThreadPoolExecutor
+from Library import AUDIO_EXTENSIONS, LYRICS_EXTENSIONS, audio_duration
+
+TIMESTAMP = re.compile(r"[\[<](\d+):(\d{1,2})(?:[.:](\d{1,3}))?[\]>]")
+BRACKETS = re.compile(r"[\(\[\{].*?[\)\]\}]")
+TRACK_NUMBER = re.compile(r"^\d{1,3}[\s._-]+")
+NON_WORD = re.compile(r"[\W_]+")
+NOISE_TOKENS = {"official", "audio", "video", "lyrics", "lyric", "remastered", "hq", "hd", "feat", "ft"}
+
+
+def normalize_name(path):
+    name = os.path.splitext(os.path.basename(path))[0].lower()
+    name = BRACKETS.sub(" ", name)
+    name = TRACK_NUMBER.sub("", name)
+    tokens = [t for t in NON_WORD.sub(" ", name).split() if t not in NOISE_TOKENS]
+    return " ".join(tokens)
+
+
+def last_timestamp(path):
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    except OSError:
+        return None
+    last = None
+    for m in TIMESTAMP.finditer(text):
+        ms = (int(m.group(1)) * 60 + int(m.group(2))) * 1000
+        if m.group(3):
+            ms += int(m.group(3).ljust(3, "0"))
+        if last is None or ms > last:
+            last = ms
+    return last
+
+
+def scan_files(root_dir, extensions):
+    out = []
+    for root, _, files in os.walk(root_dir):
+        for name in files:
+            if name.lower().endswith(extensions):
+                out.append(os.path.abspath(os.path.join(root, name)))
+    return out
+
+
+class AudioIndex:
+    def __init__(self, paths, durations):
+        self.paths = paths
+        self.names = [normalize_name(p) for p in paths]
+        self.durations = durations
+        self.by_name = {}
+        self.by_token = {}
+        for i, name in enumerate(self.names):
+            self.by_name.setdefault(name, []).append(i)
+            for token in set(name.split()):
+                self.by_token.setdefault(token, []).append(i)
+        timed = sorted((d, i) for i, d in enumerate(durations) if d is not None)
+        self.sorted_durations = [d for d, _ in timed]
+        self.sorted_ids = [i for _, i in timed]
+        # Files whose duration couldn't be read (or wasn't) are never ruled out by it
+        self.untimed_ids = {i for i, d in enumerate(durations) if d is None}
+
+    def candidates(self, name, last_ms=None, tolerance=5000, max_postings=3, max_candidates=50):
+        exact = self.by_name.get(name)
+        if exact:
+            return set(exact)
+        # Only the rarest few tokens are looked up, so common words like "love" don't fan out
+        postings = sorted((self.by_token[t] for t in set(name.split()) if t in self.by_token), key=len)
+        found = set()
+        for ids in postings[:max_postings]:
+            found.update(ids)
+        if len(found) > max_candidates and last_ms is not None:
+            # Same bounds as duration_ok()
+            found &= self.untimed_ids.union(self.with_duration(last_ms - tolerance, 2 * (last_ms + tolerance)))
+        return found
+
+    def with_duration(self, min_ms, max_ms):
+        lo = bisect.bisect_left(self.sorted_durations, min_ms)
+        hi = bisect.bisect_right(self.sorted_durations, max_ms)
+        return self.sorted_ids[lo:hi]
+
+
+def duration_ok(last_ms, duration, tolerance):
+    # Lyrics can't run past the audio, and should reach at least half of it
+    if last_ms is None or duration is None:
+        return None
+    return duration * 0.5 - tolerance <= last_ms <= duration + tolerance
+
+
+def pair(lyrics_paths, index, min_score=0.6, tolerance=5000):
+    scored = []
+    for lp in lyrics_paths:
+        name = normalize_name(lp)
+        last_ms = last_timestamp(lp)
+        for i in index.candidates(name, last_ms, tolerance):
+            matcher = SequenceMatcher(None, name, index.names[i], autojunk=False)
+            if matcher.quick_ratio() < min_score:
+                continue
+            score = matcher.ratio()
+            check = duration_ok(last_ms, index.durations[i], tolerance)
+            if check is False:
+                continue
+            if check:
+                score += 0.1
+            if score >= min_score:
+                scored.append((score, lp, i, last_ms))
+    # Greedy one-to-one assignment, best matches first
+    scored.sort(key=lambda s: -s[0])
+    used_lyrics = set()
+    used_audio = set()
+    pairs = []
+    for score, lp, i, last_ms in scored:
+        if lp in used_lyrics or i in used_audio:
+            continue
+        used_lyrics.add(lp)
+        used_audio.add(i)
+        pairs.append({
+            "lyrics": lp,
+            "audio": index.paths[i],
+            "score": round(min(score, 1.0), 3),
+            "duration": index.durations[i],
+            "last_timestamp": last_ms,
+        })
+    unmatched = [lp for lp in lyrics_paths if lp not in used_lyrics]
+    return pairs, unmatched
+
+
+def build_index(audio_dir, workers=8, read_durations=True):
+    paths = scan_files(audio_dir, AUDIO_EXTENSIONS)
+    if read_durations:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            durations = list(pool.map(audio_duration, paths, chunksize=64))
+    else:
+        durations = [None] * len(paths)
+    return AudioIndex(paths, durations)
+
+
+def write_manifest(path, pairs, unmatched):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"pairs": pairs, "unmatched": unmatched}, f, indent=1)
+
+
+def load_manifest(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return {p["lyrics"]: p["audio"] for p in json.load(f)["pairs"]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pair audio files with lyrics files")
+    parser.add_argument("audio_dir")
+    parser.add_argument("lyrics_dir")
+    parser.add_argument("-o", "--output", default="pairing.json")
+    parser.add_argument("--min-score", type=float, default=0.6)
+    parser.add_argument("--tolerance", type=int, default=5000, help="duration tolerance in ms")
+    parser.add_argument("--no-durations", action="store_true")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index = build_index(args.audio_dir, read_durations=not args.no_durations)
+    lyrics_paths = scan_files(args.lyrics_dir, LYRICS_EXTENSIONS)
+    indexed = time.perf_counter()
+    pairs, unmatched = pair(lyrics_paths, index, args.min_score, args.tolerance)
+    write_manifest(args.output, pairs, unmatched)
+    print(f"{len(pairs)} paired, {len(unmatched)} unmatched "
+          f"(index {indexed - start:.2f}s, match {time.perf_counter() - indexed:.2f}s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import sys
+import json
+import asyncio
+import argparse
+
+
+class SyncState:
+    def __init__(self):
+        self.lines = []
+        self.state = {}
+
+    def apply(self, msg):
+        kind = msg.get("k")
+        if kind == "lyrics":
+            self.lines = msg["lines"]
+            self.state = {}
+            return
+        if kind == "sync":
+            self.state = {}
+        self.state.update({key: v for key, v in msg.items() if key != "k"})
+
+    def current_line(self):
+        line_idx = self.state.get("l", -1)
+        word_idx = self.state.get("w", -1)
+        if not 0 <= line_idx < len(self.lines):
+            return ""
+        words = self.lines[line_idx]
+        return " ".join(f"\033[7m{w}\033[0m" if j == word_idx else w for j, w in enumerate(words))
+
+
+async def run(url):
+    import websockets
+    state = SyncState()
+    async with websockets.connect(url, compression=None) as ws:
+        async for raw in ws:
+            state.apply(json.loads(raw))
+            sys.stdout.write("\r\033[K" + state.current_line())
+            sys.stdout.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the line currently sung on a LyricsSynk sync server")
+    parser.add_argument("url", nargs="?", default="ws://127.0.0.1:8765")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(run(args.url))
+    except KeyboardInterrupt:
+        print()
+
+
+if __name__ == "__main__":
+    main()
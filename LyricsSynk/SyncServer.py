@@ -0,0 +1,186 @@
+import json
+import time
+import asyncio
+import threading
+from bisect import bisect_right
+
+
+class TimingIndex:
+    def __init__(self, lyrics):
+        timed = []
+        for i, ln in enumerate(lyrics.lines):
+            for j, w in enumerate(ln.words):
+                if w.start_time is not None:
+                    timed.append((w.start_time, i, j))
+        timed.sort()
+        self.starts = [t for t, _, _ in timed]
+        self.words = [(i, j) for _, i, j in timed]
+
+    def at(self, position):
+        k = bisect_right(self.starts, position) - 1
+        return self.words[k] if k >= 0 else (-1, -1)
+
+
+class _Client:
+    # Holds no queue: while a client is slow its updates coalesce, and the
+    # next send carries only the fields that differ from what it last received.
+    def __init__(self, server, ws):
+        self.server = server
+        self.ws = ws
+        self.sent = None
+        self.full = True
+        self.lyrics = True
+        self.wakeup = asyncio.Event()
+        self.wakeup.set()
+
+    def push(self, full=False, lyrics=False):
+        self.full = self.full or full
+        self.lyrics = self.lyrics or lyrics
+        self.wakeup.set()
+
+    async def run(self):
+        from websockets.exceptions import ConnectionClosed
+        try:
+            await self._send_loop()
+        except ConnectionClosed:
+            # The handler cleans up
+            pass
+
+    async def _send_loop(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            if self.lyrics:
+                self.lyrics = False
+                await self.ws.send(self.server.lyrics_msg)
+            state = self.server.state
+            if self.full:
+                data = self.server.encoded_sync()
+                self.full = False
+            elif self.sent is self.server.prev_state:
+                # Up to date clients all share one pre-encoded delta
+                data = self.server.encoded_delta
+            elif self.sent is state:
+                continue
+            else:
+                data = _encode({key: v for key, v in state.items() if self.sent.get(key) != v})
+            self.sent = state
+            await self.ws.send(data)
+
+
+def _encode(msg):
+    return json.dumps(msg, separators=(",", ":"))
+
+
+class SyncServer:
+    def __init__(self, host="127.0.0.1", port=8765, seek_threshold=1500):
+        self.host = host
+        self.port = port
+        self.seek_threshold = seek_threshold
+        self.index = None
+        self.lyrics_msg = json.dumps({"k": "lyrics", "lines": []})
+        self.state = {"l": -1, "w": -1, "p": 0, "r": 1.0, "t": 0.0, "s": 0}
+        self.prev_state = None
+        self.encoded_delta = None
+        self._encoded_sync = None
+        self.clients = set()
+        self.loop = None
+        self.thread = None
+        self._ready = threading.Event()
+        self._stop = None
+        self._error = None
+        self._last = (-1, -1, 0, 1.0)
+        self._seq = 0
+
+    def start(self, timeout=5.0):
+        # Runs its own event loop in a daemon thread so the Qt loop is never blocked.
+        # Raises whatever stopped the server from listening (e.g. the port is in use).
+        self._error = None
+        self._ready.clear()
+        self.thread = threading.Thread(target=lambda: asyncio.run(self._main()), daemon=True)
+        self.thread.start()
+        if not self._ready.wait(timeout):
+            self.stop()
+            raise TimeoutError(f"sync server did not start on {self.host}:{self.port}")
+        if self._error is not None:
+            self.thread.join()
+            self.loop = None
+            raise self._error
+
+    async def _main(self):
+        try:
+            import websockets
+            self.loop = asyncio.get_running_loop()
+            self._stop = self.loop.create_future()
+            async with websockets.serve(self._handler, self.host, self.port, compression=None):
+                self._ready.set()
+                await self._stop
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.set()
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._stop.set_result, None)
+            self.thread.join()
+            self.loop = None
+
+    def set_lyrics(self, lyrics):
+        index = TimingIndex(lyrics)
+        msg = json.dumps({"k": "lyrics", "lines": [[w.word for w in ln.words] for ln in lyrics.lines]})
+        if self.loop is None:
+            self.index, self.lyrics_msg = index, msg
+            return
+        self.loop.call_soon_threadsafe(self._set_lyrics, index, msg)
+
+    def _set_lyrics(self, index, msg):
+        self.index = index
+        self.lyrics_msg = msg
+        for client in self.clients:
+            client.push(full=True, lyrics=True)
+
+    def update(self, position, rate=1.0):
+        # Called from the player on every position report; only word changes,
+        # rate changes and seeks are forwarded to the server thread.
+        if self.loop is None or self.index is None:
+            return
+        line_idx, word_idx = self.index.at(position)
+        last_line, last_word, last_pos, last_rate = self._last
+        seek = position < last_pos or position - last_pos > self.seek_threshold
+        self._last = (line_idx, word_idx, position, rate)
+        if not seek and (line_idx, word_idx) == (last_line, last_word) and rate == last_rate:
+            return
+        self._seq += 1
+        state = {"l": line_idx, "w": word_idx, "p": int(position), "r": rate,
+                 "t": round(time.time() * 1000, 3), "s": self._seq}
+        self.loop.call_soon_threadsafe(self._publish, state, seek)
+
+    def _publish(self, state, full):
+        prev = self.state
+        self.prev_state = prev
+        self.state = state
+        self.encoded_delta = _encode({key: v for key, v in state.items() if prev.get(key) != v})
+        self._encoded_sync = None
+        for client in self.clients:
+            client.push(full)
+
+    def encoded_sync(self):
+        if self._encoded_sync is None:
+            self._encoded_sync = _encode(dict(self.state, k="sync"))
+        return self._encoded_sync
+
+    async def _handler(self, ws, *args):
+        from websockets.exceptions import ConnectionClosed
+        client = _Client(self, ws)
+        self.clients.add(client)
+        sender = asyncio.ensure_future(client.run())
+        try:
+            async for _ in ws:
+                # Clients may ask for a resync by sending anything
+                client.push(full=True)
+        except ConnectionClosed:
+            pass
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
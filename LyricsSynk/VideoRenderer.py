@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from Lyrics import Lyrics
+from Library import audio_duration
+
+_worker = {}
+
+
+def _init_worker(lyrics_text, width, height):
+    # Each worker process gets its own offscreen Qt and pre-shaped layout
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtGui import QGuiApplication, QFont
+    from Widgets import KaraokeLayout
+    app = QGuiApplication.instance() or QGuiApplication([])
+    font = QFont()
+    font.setPixelSize(max(18, height // 12))
+    font.setBold(True)
+    karaoke = KaraokeLayout(Lyrics(lyrics_text))
+    karaoke.build(font, width)
+    _worker.update(app=app, karaoke=karaoke, width=width, height=height)
+
+
+def _render_frame(state):
+    from PySide6.QtCore import QRect
+    from PySide6.QtGui import QImage, QPainter, QColor
+    width, height = _worker["width"], _worker["height"]
+    img = QImage(width, height, QImage.Format_RGB888)
+    img.fill(QColor("#111"))
+    p = QPainter(img)
+    p.setRenderHint(QPainter.TextAntialiasing)
+    _worker["karaoke"].paint(p, QRect(0, 0, width, height), state)
+    p.end()
+    return img
+
+
+def _raw_rgb(img, width, height):
+    data = bytes(img.constBits())
+    stride = img.bytesPerLine()
+    if stride == width * 3:
+        return data[:stride * height]
+    return b"".join(data[y * stride:y * stride + width * 3] for y in range(height))
+
+
+def render_chunk(first, last, fps, out_pattern=None):
+    # Frames with the same karaoke state are painted once and reused
+    karaoke = _worker["karaoke"]
+    width, height = _worker["width"], _worker["height"]
+    frames = []
+    prev_state = None
+    prev_img = None
+    for f in range(first, last):
+        state = karaoke.state_at(f * 1000.0 / fps)
+        if state != prev_state:
+            prev_img = _render_frame(state)
+            prev_state = state
+        if out_pattern:
+            prev_img.save(out_pattern % f)
+        else:
+            frames.append(_raw_rgb(prev_img, width, height))
+    return b"".join(frames) if not out_pattern else last - first
+
+
+def last_lyric_time(lyrics):
+    last = 0
+    for ln in lyrics.lines:
+        for t in [ln.start_time, ln.end_time] + [w.end_time or w.start_time for w in ln.words]:
+            if t is not None and t > last:
+                last = t
+    return last
+
+
+def render(lyrics_text, duration_ms, width=1920, height=1080, fps=30, out_pattern=None,
+           out=None, workers=None, chunk_frames=None, progress=sys.stderr):
+    workers = workers or os.cpu_count() or 1
+    total = int(duration_ms * fps / 1000)
+    if chunk_frames is None:
+        # Raw frames come back through the pipe, so keep those chunks small
+        chunk_frames = fps * 2 if out_pattern else 4
+    chunks = [(f, min(f + chunk_frames, total)) for f in range(0, total, chunk_frames)]
+    done = 0
+    start = time.perf_counter()
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(lyrics_text, width, height)) as pool:
+        pending = iter(chunks)
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < workers * 2:
+                chunk = next(pending, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                in_flight.append((pool.submit(render_chunk, chunk[0], chunk[1], fps, out_pattern), chunk))
+            if not in_flight:
+                break
+            future, (first, last) = in_flight.popleft()
+            result = future.result()
+            if out is not None and not out_pattern:
+                out.write(result)
+            done += last - first
+            if progress:
+                elapsed = max(time.perf_counter() - start, 1e-6)
+                print(f"\r{done}/{total} frames  {done / elapsed:.1f} fps", end="", file=progress)
+    if progress:
+        print(file=progress)
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render karaoke frames offscreen. Raw RGB24 goes to stdout, e.g. "
+                    "| ffmpeg -f rawvideo -pix_fmt rgb24 -s 1920x1080 -r 30 -i - out.mp4")
+    parser.add_argument("lyrics")
+    parser.add_argument("--audio", help="take the duration from this audio file")
+    parser.add_argument("--duration", type=float, help="duration in seconds")
+    parser.add_argument("--size", default="1920x1080")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--frames", help="write an image sequence instead, e.g. out/frame_%%05d.png")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--chunk-frames", type=int)
+    args = parser.parse_args(argv)
+
+    with open(args.lyrics, "r", encoding="utf-8") as f:
+        text = f.read()
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    if args.duration:
+        duration_ms = int(args.duration * 1000)
+    else:
+        duration_ms = (audio_duration(args.audio) if args.audio else None) or last_lyric_time(Lyrics(text)) + 2000
+    if args.frames:
+        os.makedirs(os.path.dirname(args.frames) or ".", exist_ok=True)
+    render(text, duration_ms, width, height, args.fps, args.frames,
+           None if args.frames else sys.stdout.buffer, args.workers, args.chunk_frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 from PySide6.QtWidgets import (
     QVBoxLayout, QWidget, QHBoxLayout, QScrollArea,
-    QButtonGroup, QPlainTextEdit, QPushButton
+    QButtonGroup, QPlainTextEdit, QPushButton,
+    QLineEdit, QListWidget, QListWidgetItem, QLabel
 )
-from PySide6.QtCore import Qt, QPoint
-from PySide6.QtGui import QPainter, QFontMetrics
+import time
+from bisect import bisect_right
+from PySide6.QtCore import Qt, QPoint, QPointF, QRect, QRectF, QTimer
+from PySide6.QtGui import QPainter, QFontMetrics, QFont, QColor, QTextLayout
 
 class WordBox(QPushButton):
     def __init__(self, text):
@@ -24,8 +27,24 @@ class WordBox(QPushButton):
                 border: 3px solid #1e90ff;
                 background: #333;
             }
+            WordBox[voice="v2"] {
+                color: #d9b3ff;
+            }
+            WordBox[voice="bg"] {
+                color: #aaa;
+                font-size: 11px;
+                font-style: italic;
+            }
+            WordBox[active="true"] {
+                background: #1e4f80;
+            }
         """)
 
+    def set_active(self, active):
+        self.setProperty("active", active)
+        self.style().unpolish(self)
+        self.style().polish(self)
+
     def paintEvent(self, event):
         super().paintEvent(event)
         p = QPainter(self)
@@ -59,6 +78,8 @@ class LyricsWidget(QWidget):
         self.current_word = 0
         self.parent = parent
         self.scroll_area = None
+        self.tree = lyrics.timing_tree()
+        self.active_words = set()
         self.init_ui()
 
     def init_ui(self):
@@ -83,7 +104,9 @@ class LyricsWidget(QWidget):
                 w.word_box.clicked.connect(self._make_jump_cb(w))
                 w.word_box.setProperty("line_idx", i)
                 w.word_box.setProperty("word_idx", j)
-            ln.hbox.addStretch()
+                w.word_box.setProperty("voice", ln.voice)
+            if ln.voice != "v2":
+                ln.hbox.addStretch()
             self.lyrics.vbox.addLayout(ln.hbox)
             self.lyrics.vbox.addWidget(line_widget)
         self.scroll_area.setWidget(container)
@@ -101,6 +124,17 @@ class LyricsWidget(QWidget):
                     w.word_box.end_time = w.end_time
                     w.word_box.update()
 
+    def highlight_at(self, position):
+        # Only boxes entering or leaving the active set are restyled
+        active = set(self.tree.at(position))
+        if active == self.active_words:
+            return
+        for i, j in self.active_words - active:
+            self.lyrics.lines[i].words[j].word_box.set_active(False)
+        for i, j in active - self.active_words:
+            self.lyrics.lines[i].words[j].word_box.set_active(True)
+        self.active_words = active
+
     def select_word(self, line_idx, word_idx):
         if 0 <= line_idx < len(self.lyrics.lines):
             if 0 <= word_idx < len(self.lyrics.lines[line_idx].words):
@@ -125,10 +159,24 @@ class EditorWidget(QWidget):
     def init_ui(self):
         v = QVBoxLayout(self)
         self.text = QPlainTextEdit()
-        self.refresh_text()
+        self.filled = False
         v.addWidget(self.text)
 
+    def showEvent(self, event):
+        self.ensure_filled()
+        super().showEvent(event)
+
+    def ensure_filled(self):
+        # The text is generated the first time the editor is shown or read
+        if not self.filled:
+            self.refresh_text()
+
+    def plain_text(self):
+        self.ensure_filled()
+        return self.text.toPlainText()
+
     def refresh_text(self):
+        self.filled = True
         out = []
         if self.lyrics is None:
             self.text.setPlainText("Enter lyrics or import them...")
@@ -137,6 +185,8 @@ class EditorWidget(QWidget):
             line_txt = ""
             if ln.start_time is not None:
                 line_txt += f"[{self._format_time(ln.start_time)}]"
+            if ln.voice != "v1":
+                line_txt += f"{ln.voice}: "
             for w in ln.words:
                 if w.start_time is not None and w.end_time is not None:
                     line_txt += f"<{self._format_time(w.start_time)}>{w.word} <{self._format_time(w.end_time)}>"
@@ -152,3 +202,257 @@ class EditorWidget(QWidget):
         seconds = str((ms // 1000) % 60).zfill(2)
         minutes = str((ms // 1000) // 60).zfill(2)
         return f"{minutes}:{seconds}.{milliseconds}"
+
+
+class KaraokeLayout:
+    # Pre-shaped lines for the karaoke view. Only needs QtGui, so it can also
+    # paint into an offscreen QImage.
+    def __init__(self, lyrics):
+        self.lyrics = lyrics
+        self.base_color = QColor("#777")
+        self.sung_color = QColor("#fff")
+        self.fill_color = QColor("#1e90ff")
+        self.line_spacing = 0.4
+        self.width = 0
+        self.lines = []
+        self.line_tops = []
+        self.line_starts = []
+        self.line_ids = []
+        self.word_starts = []
+        self.word_ends = {}
+        self._index_times()
+
+    def _index_times(self):
+        self.tree = self.lyrics.timing_tree()
+        for start, end, key in self.lyrics.word_intervals():
+            self.word_ends[key] = end
+        for i, ln in enumerate(self.lyrics.lines):
+            starts = [w.start_time for w in ln.words]
+            self.word_starts.append(sorted((t, j) for j, t in enumerate(starts) if t is not None))
+            start = ln.start_time if ln.start_time is not None else next((t for t in starts if t is not None), None)
+            # Overlapping voices don't move the anchor line backwards
+            if start is not None and (not self.line_starts or start >= self.line_starts[-1]):
+                self.line_starts.append(start)
+                self.line_ids.append(i)
+
+    def build(self, font, width):
+        self.width = width
+        self.lines = []
+        self.line_tops = []
+        top = 0.0
+        gap = QFontMetrics(font).height() * self.line_spacing
+        for ln in self.lyrics.lines:
+            text = " ".join(w.word for w in ln.words)
+            layout = QTextLayout(text, font)
+            layout.setCacheEnabled(True)
+            layout.beginLayout()
+            y = 0.0
+            while True:
+                row = layout.createLine()
+                if not row.isValid():
+                    break
+                row.setLineWidth(width)
+                row.setPosition(QPointF((width - row.naturalTextWidth()) / 2, y))
+                y += row.height()
+            layout.endLayout()
+            words = []
+            offset = 0
+            for w in ln.words:
+                row = layout.lineForTextPosition(offset)
+                x0 = row.cursorToX(offset)[0]
+                x1 = row.cursorToX(offset + len(w.word))[0]
+                words.append((row.lineNumber(), x0, x1))
+                offset += len(w.word) + 1
+            self.lines.append((layout, words, y))
+            self.line_tops.append(top)
+            top += y + gap
+
+    def state_at(self, position):
+        # (anchor line, ((line, word, filled x), ...)) for a playback position.
+        # Every voice singing at the position gets its own fill.
+        if not self.lines:
+            return -1, ()
+        k = bisect_right(self.line_starts, position) - 1
+        anchor = self.line_ids[k] if k >= 0 else -1
+        fills = {}
+        for i, j in self.tree.at(position):
+            if i not in fills or j > fills[i][0]:
+                fills[i] = (j, self._fill_x(i, j, position))
+        if anchor >= 0 and anchor not in fills:
+            # Between words the last started word of the anchor line stays filled
+            starts = self.word_starts[anchor]
+            n = bisect_right(starts, (position, len(self.lyrics.lines[anchor].words)))
+            if n:
+                j = starts[n - 1][1]
+                fills[anchor] = (j, int(self.lines[anchor][1][j][2]))
+        return anchor, tuple(sorted((i, j, x) for i, (j, x) in fills.items()))
+
+    def _fill_x(self, line_idx, word_idx, position):
+        w = self.lyrics.lines[line_idx].words[word_idx]
+        end = self.word_ends[(line_idx, word_idx)]
+        _, x0, x1 = self.lines[line_idx][1][word_idx]
+        frac = min(1.0, (position - w.start_time) / (end - w.start_time))
+        return int(x0 + (x1 - x0) * frac)
+
+    def origin(self, rect, line_idx):
+        # Keeps the current line vertically centred
+        if not self.lines:
+            return 0.0
+        line_idx = max(line_idx, 0)
+        height = self.lines[line_idx][2]
+        return rect.height() / 2 - height / 2 - self.line_tops[line_idx]
+
+    def word_rect(self, rect, line_idx, word_idx):
+        layout, words, height = self.lines[line_idx]
+        top = self.origin(rect, line_idx) + self.line_tops[line_idx]
+        if word_idx < 0:
+            return QRectF(0, top, rect.width(), height).toAlignedRect()
+        row_idx, x0, x1 = words[word_idx]
+        row = layout.lineAt(row_idx)
+        return QRectF(x0, top + row.y(), x1 - x0, row.height()).toAlignedRect().adjusted(-2, -2, 2, 2)
+
+    def line_rect(self, rect, line_idx):
+        return self.word_rect(rect, line_idx, -1)
+
+    def dirty_rect(self, rect, old_state, new_state):
+        anchor = new_state[0]
+        old_fills = {i: (j, x) for i, j, x in old_state[1]}
+        new_fills = {i: (j, x) for i, j, x in new_state[1]}
+        if old_state[0] != anchor or anchor < 0 or old_fills.keys() != new_fills.keys():
+            return rect
+        dirty = None
+        for line_idx, (word_idx, fill_x) in new_fills.items():
+            old_word, old_x = old_fills[line_idx]
+            if (old_word, old_x) == (word_idx, fill_x):
+                continue
+            words = self.lines[line_idx][1]
+            if old_word == word_idx:
+                r = self.word_rect(rect, line_idx, word_idx)
+            elif words[old_word][0] != words[word_idx][0]:
+                r = self.line_rect(rect, line_idx)
+            else:
+                r = self.word_rect(rect, line_idx, old_word).united(self.word_rect(rect, line_idx, word_idx))
+            dirty = r if dirty is None else dirty.united(r)
+        return dirty if dirty is not None else QRect()
+
+    def paint(self, painter, rect, state, dirty=None):
+        current, fills = state
+        fill_map = {i: (j, x) for i, j, x in fills}
+        base_y = self.origin(rect, current)
+        for i, (layout, words, height) in enumerate(self.lines):
+            top = base_y + self.line_tops[i]
+            if top > rect.height():
+                break
+            if top + height < 0:
+                continue
+            if dirty is not None and (top > dirty.bottom() or top + height < dirty.top()):
+                continue
+            pos = QPointF(0, top)
+            painter.setPen(self.sung_color if i < current and i not in fill_map else self.base_color)
+            layout.draw(painter, pos)
+            if i not in fill_map:
+                continue
+            # Repaint the sung part in the fill colour, clipped row by row
+            word_idx, fill_x = fill_map[i]
+            fill_row = words[word_idx][0]
+            painter.save()
+            painter.setPen(self.fill_color)
+            for r in range(fill_row + 1):
+                row = layout.lineAt(r)
+                right = fill_x if r == fill_row else rect.width()
+                painter.setClipRect(QRectF(0, top + row.y(), right, row.height()))
+                layout.draw(painter, pos)
+            painter.restore()
+
+
+class KaraokeWidget(QWidget):
+    def __init__(self, lyrics, position_source, is_playing=None, rate_source=None, parent=None):
+        super().__init__(parent)
+        self.lyrics = lyrics
+        self.position_source = position_source
+        self.is_playing = is_playing
+        self.rate_source = rate_source
+        self.karaoke = KaraokeLayout(lyrics)
+        self.state = (-1, ())
+        self._last_pos = None
+        self._last_pos_clock = 0.0
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(16)
+        self.timer.timeout.connect(self.tick)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.timer.stop()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        font = QFont(self.font())
+        font.setPixelSize(max(18, self.height() // 12))
+        font.setBold(True)
+        self.karaoke.build(font, self.width())
+        self.update()
+
+    def _position(self):
+        # Players report position coarsely; extrapolate between reports
+        pos = self.position_source()
+        now = time.perf_counter()
+        if pos != self._last_pos:
+            self._last_pos = pos
+            self._last_pos_clock = now
+            return pos
+        if self.is_playing is None or not self.is_playing():
+            return pos
+        rate = self.rate_source() if self.rate_source else 1.0
+        return pos + (now - self._last_pos_clock) * 1000 * rate
+
+    def tick(self):
+        state = self.karaoke.state_at(self._position())
+        if state == self.state:
+            return
+        old_state = self.state
+        self.state = state
+        self.update(self.karaoke.dirty_rect(self.rect(), old_state, state))
+
+    def paintEvent(self, event):
+        p = QPainter(self)
+        p.fillRect(event.rect(), QColor("#111"))
+        self.karaoke.paint(p, self.rect(), self.state, event.rect())
+
+
+class LibraryWidget(QWidget):
+    def __init__(self, library, parent=None):
+        super().__init__(parent)
+        self.library = library
+        self.parent = parent
+        self.init_ui()
+
+    def init_ui(self):
+        v = QVBoxLayout(self)
+        self.query = QLineEdit()
+        self.query.setPlaceholderText("Search lyrics...")
+        self.query.textChanged.connect(self.search)
+        self.results = QListWidget()
+        self.results.itemActivated.connect(self._open_item)
+        self.status = QLabel("")
+        v.addWidget(self.query)
+        v.addWidget(self.results)
+        v.addWidget(self.status)
+
+    def search(self, phrase):
+        self.results.clear()
+        rows = self.library.search(phrase)
+        for row in rows:
+            item = QListWidgetItem(f"{row['song_name']} - {row['snippet']}")
+            item.setData(Qt.UserRole, (row["lyrics_path"], row["song_path"]))
+            self.results.addItem(item)
+        self.status.setText(f"{len(rows)} results" if phrase.strip() else "")
+
+    def _open_item(self, item):
+        lyrics_path, song_path = item.data(Qt.UserRole)
+        self.parent.open_library_hit(lyrics_path, song_path, self.query.text())
@@ -0,0 +1,90 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import multiprocessing
+from Lyrics import Lyrics
+from SyncServer import SyncServer
+
+
+def synthetic_lyrics(lines=60, words=8, word_ms=250):
+    lyrics = Lyrics("\n".join(" ".join(f"w{i}_{j}" for j in range(words)) for i in range(lines)))
+    t = 0
+    for ln in lyrics.lines:
+        for w in ln.words:
+            w.start_time = t
+            w.end_time = t + word_ms - 20
+            t += word_ms
+    return lyrics
+
+
+def _client_process(url, clients, seconds, results):
+    async def one(latencies):
+        import websockets
+        async with websockets.connect(url, compression=None, max_queue=None) as ws:
+            end = time.time() + seconds
+            while time.time() < end:
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=end - time.time())
+                except asyncio.TimeoutError:
+                    break
+                msg = json.loads(raw)
+                if "t" in msg and msg["t"]:
+                    latencies.append(time.time() * 1000 - msg["t"])
+
+    async def run_all():
+        latencies = []
+        await asyncio.gather(*(one(latencies) for _ in range(clients)))
+        return latencies
+
+    results.put(asyncio.run(run_all()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Loopback fan-out load test for SyncServer")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args(argv)
+
+    server = SyncServer(port=args.port)
+    server.set_lyrics(synthetic_lyrics())
+    server.start()
+    url = f"ws://127.0.0.1:{args.port}"
+
+    results = multiprocessing.Queue()
+    per_proc = [args.clients // args.procs + (1 if i < args.clients % args.procs else 0) for i in range(args.procs)]
+    procs = [multiprocessing.Process(target=_client_process, args=(url, n, args.seconds, results))
+             for n in per_proc if n]
+    for p in procs:
+        p.start()
+    while len(server.clients) < args.clients:
+        time.sleep(0.05)
+
+    # Drive the position like a player reporting every 10 ms
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.seconds - 1:
+        server.update((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+
+    latencies = []
+    for _ in procs:
+        latencies.extend(results.get())
+    for p in procs:
+        p.join()
+    server.stop()
+
+    if not latencies:
+        print("no events received", file=sys.stderr)
+        return
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{args.clients} clients, {len(latencies)} events delivered")
+    print(f"latency ms: median {statistics.median(latencies):.2f}  p99 {p99:.2f}  max {latencies[-1]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
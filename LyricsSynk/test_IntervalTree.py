@@ -0,0 +1,39 @@
+import random
+from IntervalTree import IntervalTree
+
+
+def _random_intervals(rng, n, span):
+    out = []
+    for k in range(n):
+        start = rng.randrange(span)
+        out.append((start, start + rng.randrange(0, span // 4), k))
+    return out
+
+
+def test_at_matches_brute_force():
+    rng = random.Random(1)
+    for _ in range(50):
+        intervals = _random_intervals(rng, rng.randrange(1, 60), 200)
+        tree = IntervalTree(intervals)
+        for t in range(-2, 202):
+            expected = sorted(k for s, e, k in intervals if s <= t < e)
+            assert sorted(tree.at(t)) == expected, (intervals, t)
+
+
+def test_overlapping_matches_brute_force():
+    rng = random.Random(2)
+    for _ in range(50):
+        intervals = _random_intervals(rng, rng.randrange(1, 60), 200)
+        tree = IntervalTree(intervals)
+        for _ in range(200):
+            t0 = rng.randrange(-5, 205)
+            t1 = t0 + rng.randrange(0, 40)
+            expected = sorted(k for s, e, k in intervals if e > s and s <= t1 and e > t0)
+            assert sorted(tree.overlapping(t0, t1)) == expected, (intervals, t0, t1)
+
+
+def test_empty_intervals_are_dropped():
+    tree = IntervalTree([(5, 5, "a"), (3, 8, "b")])
+    assert len(tree) == 1
+    assert tree.at(5) == ["b"]
+    assert IntervalTree([]).at(0) == []
@@ -1,57 +1,299 @@
-import sys, os, re, math
+import sys, os, json, time
+from bisect import bisect_left, bisect_right
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget,
-    QFileDialog, QHBoxLayout, QLabel, QSlider, QTextEdit, QScrollArea,
-    QButtonGroup, QStackedWidget, QPlainTextEdit
+    QFileDialog, QHBoxLayout, QLabel, QSlider, QScrollArea,
+    QButtonGroup, QStackedWidget, QPlainTextEdit, QSpinBox
 )
-from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
-from PySide6.QtCore import QUrl, Qt, QTimer, QPoint
-from PySide6.QtGui import QKeySequence, QShortcut, QPainter, QFontMetrics
+from PySide6.QtCore import (
+    QUrl, Qt, QTimer, QPoint, QObject, QRunnable, QThreadPool, Signal,
+    QEvent, QPropertyAnimation, QEasingCurve
+)
+from PySide6.QtGui import QKeySequence, QShortcut, QPainter, QFontMetrics, QTextCursor
+
+# The lyrics model and the audio backends are shared with the package app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "LyricsSynk"))
+
+from Lyrics import Lyrics as BaseLyrics, LyricsLine as BaseLyricsLine, LyricsWord as BaseLyricsWord
 
 
-class LyricsWord:
+class LyricsWord(BaseLyricsWord):
+    __slots__ = ("raw_start_time", "raw_end_time")
+
     def __init__(self, word, line_start_time):
-        self.word = word
-        self.line_start_time = line_start_time
-        self.start_time = None
-        self.end_time = None
-        self.word_box = None
+        super().__init__(word, line_start_time)
+        # Tap times before onset snapping
+        self.raw_start_time = None
+        self.raw_end_time = None
 
 
-class LyricsLine:
-    def __init__(self, line):
-        self.start_time = None
-        self.hbox = None
-        self.words = []
-        self.words_with_time = line
-        if self.words_with_time.strip():
-            for w in self.words_with_time.split():
-                if w.strip():
-                    self.words.append(LyricsWord(w, self.start_time))
-        self.end_time = None
-        self.words_length = len(self.words)
+class LyricsLine(BaseLyricsLine):
+    __slots__ = ()
+    word_class = LyricsWord
+
 
-    def toarray(self):
-        return self.words
+class Lyrics(BaseLyrics):
+    line_class = LyricsLine
 
 
-class Lyrics:
-    def __init__(self, lyrics):
-        self.return_string = []
-        self.vbox = None
-        self.lines_with_time = lyrics.split("\n")
-        self.lines = []
-        self.lyricsPath = ""
-        self.songName = ""
-        for ln in self.lines_with_time:
-            if ln.strip():
-                self.lines.append(LyricsLine(ln))
+class TimingEdit:
+    # *_raw are the (start, end) tap times before onset snapping; *_line the
+    # line's own (start, end), which a tap on its first or last word moves
+    __slots__ = ("line_idx", "word_idx", "old_start", "old_end", "new_start", "new_end",
+                 "old_raw", "new_raw", "old_line", "new_line")
 
-    def toarray(self):
-        self.return_string = []
-        for ln in self.lines:
-            self.return_string.append(ln.toarray())
-        return self.return_string
+    def __init__(self, line_idx, word_idx, old_start, old_end, new_start=None, new_end=None,
+                 old_raw=(None, None), new_raw=(None, None), old_line=(None, None), new_line=(None, None)):
+        self.line_idx = line_idx
+        self.word_idx = word_idx
+        self.old_start = old_start
+        self.old_end = old_end
+        self.new_start = new_start
+        self.new_end = new_end
+        self.old_raw = old_raw
+        self.new_raw = new_raw
+        self.old_line = old_line
+        self.new_line = new_line
+
+
+class TimingHistory:
+    # Stores only the timing deltas of each tap, so memory grows with the number
+    # of edits rather than with the size of the lyrics.
+    def __init__(self):
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def push(self, edit):
+        if ((edit.old_start, edit.old_end, edit.old_raw, edit.old_line)
+                == (edit.new_start, edit.new_end, edit.new_raw, edit.new_line)):
+            return
+        self.undo_stack.append(edit)
+        self.redo_stack.clear()
+
+    def undo(self, lyrics):
+        if not self.undo_stack:
+            return None
+        edit = self.undo_stack.pop()
+        self._apply(lyrics, edit, edit.old_start, edit.old_end, edit.old_raw, edit.old_line)
+        self.redo_stack.append(edit)
+        return edit
+
+    def redo(self, lyrics):
+        if not self.redo_stack:
+            return None
+        edit = self.redo_stack.pop()
+        self._apply(lyrics, edit, edit.new_start, edit.new_end, edit.new_raw, edit.new_line)
+        self.undo_stack.append(edit)
+        return edit
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    def _apply(self, lyrics, edit, start_time, end_time, raw, line):
+        ln = lyrics.lines[edit.line_idx]
+        w = ln.words[edit.word_idx]
+        w.start_time = start_time
+        w.end_time = end_time
+        w.raw_start_time, w.raw_end_time = raw
+        ln.start_time, ln.end_time = line
+
+
+class SessionRecorder:
+    # One line per event: "<wall ms> <media ms> <kind> <a> <b>". Lines starting
+    # with "#" load a song or lyrics file at that point of the session.
+    # "# lyrics" with no path clears the lyrics; "# apply <json string>" is editor
+    # text that was applied. Kinds: kp/kr key press/release (a = key, b = modifiers), sk slider seek
+    # (a = position), rt playback speed (a = percent), jw jump to word (a = line, b = word),
+    # sn onset snapping (a = enabled, b = window ms), du song duration (a = ms),
+    # cw current word at the start of the recording (a = line, b = word).
+    def __init__(self, file_path):
+        # Line buffered so a crash loses at most the event being written
+        self.file = open(file_path, "w", encoding="utf-8", buffering=1)
+        self.start = time.perf_counter()
+
+    def load(self, kind, file_path=""):
+        self.file.write(f"# {kind} {file_path}".rstrip() + "\n")
+
+    def record(self, kind, position, a=0, b=0):
+        wall = int((time.perf_counter() - self.start) * 1000)
+        self.file.write(f"{wall} {int(position)} {kind} {a} {b}\n")
+
+    def close(self):
+        self.file.close()
+
+
+class LyricsLoaderSignals(QObject):
+    loaded = Signal(int, object)
+
+
+class LyricsLoader(QRunnable):
+    # Reads and parses a lyrics file off the GUI thread
+    def __init__(self, index, file_path):
+        super().__init__()
+        self.index = index
+        self.file_path = file_path
+        self.signals = LyricsLoaderSignals()
+
+    def run(self):
+        lyrics = None
+        if self.file_path:
+            try:
+                with open(self.file_path, "r", encoding="utf-8") as f:
+                    lyrics = Lyrics(f.read())
+                lyrics.songName = self.file_path.split("/")[-1]
+            except (OSError, UnicodeDecodeError):
+                lyrics = None
+        self.signals.loaded.emit(self.index, lyrics)
+
+
+class OnsetIndex:
+    # Sorted vocal onset/offset times (ms) of a song, for snapping taps
+    def __init__(self, onsets, offsets):
+        self.onsets = onsets
+        self.offsets = offsets
+
+    @classmethod
+    def from_samples(cls, samples, rate, frame=1024, hop=256, block=2048, gate_db=40.0, fall_db=3.0):
+        import numpy as np
+        x = np.asarray(samples, dtype=np.float32)
+        if len(x) < frame:
+            return cls([], [])
+        # Peak-normalized, so the log-magnitude flux (and the gate) doesn't depend
+        # on the sample format or the song's loudness
+        peak = float(np.max(np.abs(x)))
+        if peak > 0:
+            x = x / peak
+        window = np.hanning(frame).astype(np.float32)
+        n_frames = 1 + (len(x) - frame) // hop
+        flux = np.zeros(n_frames, dtype=np.float32)
+        energy = np.zeros(n_frames, dtype=np.float32)
+        prev = None
+        # Frames are built a block at a time so memory doesn't scale with song length
+        for b in range(0, n_frames, block):
+            count = min(block, n_frames - b)
+            idx = (b + np.arange(count))[:, None] * hop + np.arange(frame)[None, :]
+            frames = x[idx]
+            energy[b:b + count] = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+            mag = np.log1p(np.abs(np.fft.rfft(frames * window, axis=1)))
+            if prev is None:
+                prev = mag[:1]
+            diff = np.diff(np.vstack([prev, mag]), axis=0)
+            flux[b:b + count] = np.maximum(diff, 0).sum(axis=1)
+            prev = mag[-1:]
+        change = np.diff(energy, prepend=energy[0])
+        drop = np.maximum(-change, 0)
+        # Frames more than gate_db below the loudest are noise. An onset also needs
+        # the energy a frame length later to hold up, since a sound being cut off
+        # has flux too. Offsets need the frame before the drop to be above the gate.
+        floor = energy.max() - gate_db
+        ahead = frame // hop
+        later = np.concatenate((energy[ahead:], np.full(min(ahead, n_frames), floor - 1, dtype=np.float32)))
+        flux[(energy < floor) | (later < energy - fall_db)] = 0
+        drop[np.concatenate(([True], energy[:-1] < floor))] = 0
+        ms_per_frame = hop * 1000.0 / rate
+        onsets = cls._peaks(flux, ms_per_frame)
+        offsets = cls._peaks(drop, ms_per_frame)
+        # Flux peaks once the onset is about three quarters into the analysis frame
+        shift = frame * 750.0 / rate
+        return cls([int(t + shift) for t in onsets], [int(t) for t in offsets])
+
+    @staticmethod
+    def _peaks(curve, ms_per_frame, spread_ms=150, delta=0.5, min_gap_ms=30):
+        import numpy as np
+        w = max(1, int(spread_ms / ms_per_frame))
+        kernel = np.ones(2 * w + 1, dtype=np.float32) / (2 * w + 1)
+        threshold = np.convolve(curve, kernel, mode="same") + delta * curve.std()
+        mid = curve[1:-1]
+        is_peak = (mid > curve[:-2]) & (mid >= curve[2:]) & (mid > threshold[1:-1])
+        times = (np.nonzero(is_peak)[0] + 1) * ms_per_frame
+        out = []
+        for t in times.tolist():
+            if not out or t - out[-1] >= min_gap_ms:
+                out.append(t)
+        return out
+
+    def snap(self, t, window, offset=False):
+        times = self.offsets if offset else self.onsets
+        k = bisect_left(times, t)
+        best = None
+        for c in times[max(0, k - 1):k + 1]:
+            if abs(c - t) <= window and (best is None or abs(c - t) < abs(best - t)):
+                best = c
+        return t if best is None else best
+
+
+class OnsetWorkerSignals(QObject):
+    done = Signal(str, object)
+
+
+class OnsetWorker(QRunnable):
+    def __init__(self, file_path, chunks, sample_format, rate, channels):
+        super().__init__()
+        self.file_path = file_path
+        self.chunks = chunks
+        self.sample_format = sample_format
+        self.rate = rate
+        self.channels = channels
+        self.signals = OnsetWorkerSignals()
+
+    def run(self):
+        import numpy as np
+        samples = np.frombuffer(b"".join(self.chunks), dtype=self.sample_format)
+        if self.channels > 1:
+            samples = samples[:len(samples) - len(samples) % self.channels]
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        self.chunks = None
+        self.signals.done.emit(self.file_path, OnsetIndex.from_samples(samples, self.rate))
+
+
+class OnsetAnalyzer(QObject):
+    # Decodes a song with QAudioDecoder and builds its OnsetIndex off the GUI thread
+    ready = Signal(str, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.decoder = None
+        self.file_path = None
+        self.chunks = []
+        self.format = None
+
+    def analyze(self, file_path):
+        from PySide6.QtMultimedia import QAudioDecoder, QAudioFormat
+        if self.decoder is None:
+            self.decoder = QAudioDecoder(self)
+            self.decoder.bufferReady.connect(self._on_buffer)
+            self.decoder.finished.connect(self._on_finished)
+            fmt = QAudioFormat()
+            fmt.setSampleRate(22050)
+            fmt.setChannelCount(1)
+            fmt.setSampleFormat(QAudioFormat.Int16)
+            self.decoder.setAudioFormat(fmt)
+        self.decoder.stop()
+        self.file_path = file_path
+        self.chunks = []
+        self.format = None
+        self.decoder.setSource(QUrl.fromLocalFile(file_path))
+        self.decoder.start()
+
+    def _on_buffer(self):
+        from PySide6.QtMultimedia import QAudioFormat
+        buffer = self.decoder.read()
+        if self.format is None:
+            fmt = buffer.format()
+            dtype = {QAudioFormat.Int16: "<i2", QAudioFormat.Int32: "<i4",
+                     QAudioFormat.Float: "<f4", QAudioFormat.UInt8: "u1"}.get(fmt.sampleFormat(), "<i2")
+            self.format = (dtype, fmt.sampleRate(), fmt.channelCount())
+        self.chunks.append(bytes(buffer.constData())[:buffer.byteCount()])
+
+    def _on_finished(self):
+        if self.format is None:
+            return
+        dtype, rate, channels = self.format
+        worker = OnsetWorker(self.file_path, self.chunks, dtype, rate, channels)
+        worker.signals.done.connect(self.ready)
+        self.chunks = []
+        QThreadPool.globalInstance().start(worker)
 
 
 class WordBox(QPushButton):
@@ -107,6 +349,13 @@ class LyricsWidget(QWidget):
         self.current_word = 0
         self.parent = parent
         self.scroll_area = None
+        self.scroll_anim = None
+        # (top, height) of each line in the container, dropped on relayout
+        self.line_tops = None
+        # Sorted (start, line) of timed lines and the span of the followed line
+        self.line_starts = None
+        self.follow_line = -1
+        self.follow_span = (0, -1)
         self.init_ui()
 
     def init_ui(self):
@@ -134,13 +383,26 @@ class LyricsWidget(QWidget):
             ln.hbox.addStretch()
             self.lyrics.vbox.addLayout(ln.hbox)
         self.scroll_area.setWidget(container)
+        container.installEventFilter(self)
         outer = QVBoxLayout(self)
         outer.addWidget(self.scroll_area)
 
+        bar = self.scroll_area.verticalScrollBar()
+        self.scroll_anim = QPropertyAnimation(bar, b"value", self)
+        self.scroll_anim.setDuration(350)
+        self.scroll_anim.setEasingCurve(QEasingCurve.OutCubic)
+        bar.sliderPressed.connect(self.scroll_anim.stop)
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.Resize, QEvent.LayoutRequest):
+            self.line_tops = None
+        return super().eventFilter(obj, event)
+
     def _make_jump_cb(self, w):
         return lambda: self.parent.jump_to_word(w)
 
     def update_times(self):
+        self._timings_changed()
         for ln in self.lyrics.lines:
             for w in ln.words:
                 if w.word_box:
@@ -148,6 +410,19 @@ class LyricsWidget(QWidget):
                     w.word_box.end_time = w.end_time
                     w.word_box.update()
 
+    def update_word(self, line_idx, word_idx):
+        self._timings_changed()
+        w = self.lyrics.lines[line_idx].words[word_idx]
+        if w.word_box:
+            w.word_box.start_time = w.start_time
+            w.word_box.end_time = w.end_time
+            if w.raw_start_time is not None or w.raw_end_time is not None:
+                w.word_box.setToolTip(f"tapped {w.raw_start_time} - {w.raw_end_time} ms\n"
+                                      f"snapped {w.start_time} - {w.end_time} ms")
+            else:
+                w.word_box.setToolTip("")
+            w.word_box.update()
+
     def select_word(self, line_idx, word_idx):
         if 0 <= line_idx < len(self.lyrics.lines):
             if 0 <= word_idx < len(self.lyrics.lines[line_idx].words):
@@ -158,35 +433,58 @@ class LyricsWidget(QWidget):
                     self.current_word = word_idx
                     self.scroll_to_line(line_idx)
 
-    def scroll_to_line(self, line_idx):
-        if not self.scroll_area or line_idx >= len(self.lyrics.lines):
-            return
+    def _timings_changed(self):
+        self.line_starts = None
+        self.follow_span = (0, -1)
 
-        container = self.scroll_area.widget()
-        if not container:
-            return
+    def _ensure_line_tops(self):
+        if self.line_tops is None:
+            self.scroll_area.widget().layout().activate()
+            self.line_tops = [(r.y(), r.height()) for r in (ln.hbox.geometry() for ln in self.lyrics.lines)]
+        return self.line_tops
 
-        line_layout = self.lyrics.lines[line_idx].hbox
-        if not line_layout:
+    def _ensure_line_starts(self):
+        if self.line_starts is None:
+            starts = []
+            for i, ln in enumerate(self.lyrics.lines):
+                # Plain .lrc lines only carry the line timestamp
+                t = next((w.start_time for w in ln.words if w.start_time is not None), ln.start_time)
+                if t is not None:
+                    starts.append((t, i))
+            starts.sort()
+            self.line_starts = ([t for t, _ in starts], [i for _, i in starts])
+        return self.line_starts
+
+    def follow(self, position):
+        # Called on every position report; only a line change does any real work
+        lo, hi = self.follow_span
+        if lo <= position < hi:
             return
-
-        line_widget = None
-        for i in range(line_layout.count()):
-            item = line_layout.itemAt(i)
-            if item and item.widget():
-                line_widget = item.widget().parent()
-                break
-
-        if not line_widget:
+        times, lines = self._ensure_line_starts()
+        k = bisect_right(times, position) - 1
+        if k < 0:
+            self.follow_span = (float("-inf"), times[0] if times else float("inf"))
             return
+        self.follow_span = (times[k], times[k + 1] if k + 1 < len(times) else float("inf"))
+        if lines[k] != self.follow_line:
+            self.follow_line = lines[k]
+            self.scroll_to_line(lines[k])
 
-        viewport_height = self.scroll_area.viewport().height()
-        widget_height = line_widget.height()
-
-        vertical_bar = self.scroll_area.verticalScrollBar()
-        if vertical_bar:
-            center_position = line_widget.y() - (viewport_height // 2) + (widget_height // 2)
-            vertical_bar.setValue(max(0, center_position))
+    def scroll_to_line(self, line_idx, animate=True):
+        if not self.scroll_area or not 0 <= line_idx < len(self.lyrics.lines):
+            return
+        top, height = self._ensure_line_tops()[line_idx]
+        bar = self.scroll_area.verticalScrollBar()
+        target = top + height // 2 - self.scroll_area.viewport().height() // 2
+        target = max(bar.minimum(), min(target, bar.maximum()))
+        # One animation is retargeted from wherever the bar currently is
+        self.scroll_anim.stop()
+        if not animate:
+            bar.setValue(target)
+        elif target != bar.value():
+            self.scroll_anim.setStartValue(bar.value())
+            self.scroll_anim.setEndValue(target)
+            self.scroll_anim.start()
 
 
 class EditorWidget(QWidget):
@@ -198,23 +496,51 @@ class EditorWidget(QWidget):
     def init_ui(self):
         v = QVBoxLayout(self)
         self.text = QPlainTextEdit()
-        self.refresh_text()
+        self.filled = False
         v.addWidget(self.text)
 
+    def showEvent(self, event):
+        self.ensure_filled()
+        super().showEvent(event)
+
+    def ensure_filled(self):
+        # The text is generated the first time the editor is shown or read
+        if not self.filled:
+            self.refresh_text()
+
+    def plain_text(self):
+        self.ensure_filled()
+        return self.text.toPlainText()
+
     def refresh_text(self):
+        self.filled = True
         out = []
         for ln in self.lyrics.lines:
-            line_txt = ""
-            if ln.start_time is not None:
-                line_txt += f"[{self._format_time(ln.start_time)}]"
-            for w in ln.words:
-                if w.start_time is not None and w.end_time is not None:
-                    line_txt += f"<{self._format_time(w.start_time)}>{w.word}<{self._format_time(w.end_time)}> "
-                else:
-                    line_txt += f"{w.word} "
-            out.append(line_txt.strip())
+            out.append(self._line_text(ln))
         self.text.setPlainText("\n".join(out))
 
+    def refresh_line(self, line_idx):
+        # Rewrite a single block through a cursor so the editor keeps its undo stack
+        if not self.filled:
+            return
+        block = self.text.document().findBlockByNumber(line_idx)
+        if not block.isValid():
+            return
+        cursor = QTextCursor(block)
+        cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+        cursor.insertText(self._line_text(self.lyrics.lines[line_idx]))
+
+    def _line_text(self, ln):
+        line_txt = ""
+        if ln.start_time is not None:
+            line_txt += f"[{self._format_time(ln.start_time)}]"
+        for w in ln.words:
+            if w.start_time is not None and w.end_time is not None:
+                line_txt += f"<{self._format_time(w.start_time)}>{w.word}<{self._format_time(w.end_time)}> "
+            else:
+                line_txt += f"{w.word} "
+        return line_txt.strip()
+
     def _format_time(self, ms):
         if ms is None:
             return "00:00.000"
@@ -225,7 +551,7 @@ class EditorWidget(QWidget):
 
 
 class MusicPlayer(QMainWindow):
-    def __init__(self):
+    def __init__(self, backend="qt"):
         super().__init__()
         self.lyrics = Lyrics("")
         self.setWindowTitle("Music Player")
@@ -234,10 +560,24 @@ class MusicPlayer(QMainWindow):
         self.wordReached = 0
         self.timingWord = False
         self.pressedKey = ""
-        self.player = QMediaPlayer()
-        self.audio_output = QAudioOutput()
-        self.player.setAudioOutput(self.audio_output)
-        self.audio_output.setVolume(0.5)
+        self.history = TimingHistory()
+        self.backend = backend
+        self.player = None
+        # Timing the last word writes <songName>.elrc to the working directory
+        self.autosave = True
+        self.volume = 0.5
+        self.playback_rate = 1.0
+        self.playlist = []
+        self.playlist_index = -1
+        self.prefetched = None
+        self.snap_enabled = False
+        self.snap_window = 60
+        self.onsets = None
+        self.onset_analyzer = None
+        self.song_path = None
+        self.lyrics_path = None
+        self.recorder = None
+        self.follow_playback = True
         central = QWidget()
         self.setCentralWidget(central)
         self.stack = QStackedWidget()
@@ -255,13 +595,82 @@ class MusicPlayer(QMainWindow):
         nav.addWidget(self.switch_to_editor_btn)
         outer.addLayout(nav)
 
-        self.player.durationChanged.connect(self.duration_changed)
-        self.player.positionChanged.connect(self.update_slider)
-        self.player.playbackStateChanged.connect(self.on_state_changed)
+    def _create_backend(self):
+        from AudioBackend import create_backend
+        player = create_backend(self.backend, self)
+        player.set_volume(self.volume)
+        player.set_rate(self.playback_rate)
+        return player
+
+    def _ensure_player(self):
+        # The audio backend (and QtMultimedia behind it) is created on the first song load
+        if self.player is None:
+            self.player = self._create_backend()
+            self._connect_player(self.player)
+        return self.player
+
+    def position(self):
+        return self.player.position() if self.player else 0
+
+    def analyze_onsets(self):
+        if not self.song_path:
+            return
+        if self.onset_analyzer is None:
+            self.onset_analyzer = OnsetAnalyzer(self)
+            self.onset_analyzer.ready.connect(self._on_onsets_ready)
+        self.onset_analyzer.analyze(self.song_path)
+
+    def _on_onsets_ready(self, file_path, onsets):
+        if file_path == self.song_path:
+            self.onsets = onsets
+
+    def set_snap_enabled(self, enabled):
+        self.snap_enabled = enabled
+        if self.recorder:
+            self.recorder.record("sn", self.position(), int(enabled), self.snap_window)
+        if enabled and self.onsets is None:
+            self.analyze_onsets()
+
+    def set_snap_window(self, window):
+        self.snap_window = window
+        if self.recorder:
+            self.recorder.record("sn", self.position(), int(self.snap_enabled), window)
+
+    def snap_time(self, pos, offset=False):
+        if not self.snap_enabled or self.onsets is None:
+            return pos
+        return self.onsets.snap(pos, self.snap_window, offset)
+
+    def duration(self):
+        return self.player.duration() if self.player else 0
+
+    def follow_position(self, position):
+        if self.follow_playback and self.lyrics_widget:
+            self.lyrics_widget.follow(position)
+
+    def _connect_player(self, player):
+        player.duration_changed.connect(self.duration_changed)
+        player.position_changed.connect(self.update_slider)
+        player.position_changed.connect(self.follow_position)
+        player.state_changed.connect(self.on_state_changed)
+        player.media_ended.connect(self.on_media_ended)
+
+    def _disconnect_player(self, player):
+        player.duration_changed.disconnect(self.duration_changed)
+        player.position_changed.disconnect(self.update_slider)
+        player.position_changed.disconnect(self.follow_position)
+        player.state_changed.disconnect(self.on_state_changed)
+        player.media_ended.disconnect(self.on_media_ended)
 
     def load_song(self, file_path):
         if file_path:
-            self.player.setSource(QUrl.fromLocalFile(file_path))
+            self._ensure_player().load(file_path)
+            self.song_path = file_path
+            if self.recorder:
+                self.recorder.load("song", file_path)
+            self.onsets = None
+            if self.snap_enabled:
+                self.analyze_onsets()
             self.label.setText(file_path.split("/")[-1])
             self.play_btn.setEnabled(True)
             self.play_btn.setText("Play")
@@ -271,40 +680,163 @@ class MusicPlayer(QMainWindow):
             self, "Open Lyrics", "", "Text Files (*.txt *.lrc)"
         )
         if file_path:
-            with open(file_path, "r", encoding="utf-8") as f:
-                self.lyrics = Lyrics(f.read())
-                self.lyrics.songName = file_path.split("/")[-1]
-            self.lyrics_string = self.lyrics.toarray()
-            self.lyrics_widget = LyricsWidget(self.lyrics, self)
-            self.editor_widget = EditorWidget(self.lyrics, self)
-            self.stack.addWidget(self.lyrics_widget)
-            self.stack.addWidget(self.editor_widget)
-            self.stack.setCurrentIndex(0)
-
-    def apply_lyrics_from_editor(self):
-        text = self.editor_widget.text.toPlainText()
-        self.lyrics = Lyrics(text)
-        self.lyrics_string = self.lyrics.toarray()
-
-        # Store current position
-        current_line = self.lineReached
-        current_word = self.wordReached
-
-        # Remove old widgets
+            self.load_lyrics(file_path)
+
+    def load_lyrics(self, file_path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            lyrics = Lyrics(f.read())
+            lyrics.songName = file_path.split("/")[-1]
+        self.lyrics_path = file_path
+        if self.recorder:
+            self.recorder.load("lyrics", file_path)
+        self.set_lyrics(lyrics)
+
+    def clear_lyrics(self):
+        # A song without lyrics: the previous song's must not take taps (or autosave)
+        self.lyrics_path = None
+        if self.recorder:
+            self.recorder.load("lyrics")
+        self.set_lyrics(Lyrics(""))
+
+    def set_lyrics(self, lyrics, lyrics_widget=None, editor_widget=None):
+        # Prebuilt widgets (from the playlist prefetch) are swapped in as they are
+        self.lyrics = lyrics
+        self.history.clear()
+        self.lineReached = 0
+        self.wordReached = 0
         if self.lyrics_widget:
             self.stack.removeWidget(self.lyrics_widget)
             self.lyrics_widget.deleteLater()
         if self.editor_widget:
             self.stack.removeWidget(self.editor_widget)
             self.editor_widget.deleteLater()
-
-        # Create new widgets
-        self.lyrics_widget = LyricsWidget(self.lyrics, self)
-        self.editor_widget = EditorWidget(self.lyrics, self)
-
-        # Add to stack
+        self.lyrics_widget = lyrics_widget or LyricsWidget(self.lyrics, self)
+        self.editor_widget = editor_widget or EditorWidget(self.lyrics, self)
         self.stack.insertWidget(0, self.lyrics_widget)
         self.stack.insertWidget(1, self.editor_widget)
+        self.stack.setCurrentIndex(0)
+
+    def add_to_playlist(self, song_path, lyrics_path=None):
+        if lyrics_path is None:
+            lyrics_path = self._find_lyrics_for(song_path)
+        self.playlist.append((song_path, lyrics_path))
+        if self.playlist_index + 1 == len(self.playlist) - 1 and self.playlist_index >= 0:
+            self.prefetch(self.playlist_index + 1)
+
+    def _find_lyrics_for(self, song_path):
+        stem = os.path.splitext(song_path)[0]
+        for candidate in (song_path + ".elrc", stem + ".elrc", stem + ".lrc", stem + ".txt"):
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def play_index(self, index):
+        if not 0 <= index < len(self.playlist):
+            return
+        song_path, lyrics_path = self.playlist[index]
+        self.playlist_index = index
+        self.load_song(song_path)
+        if lyrics_path:
+            self.load_lyrics(lyrics_path)
+        else:
+            self.clear_lyrics()
+        self.player.play()
+        self.prefetch(index + 1)
+
+    def prefetch(self, index):
+        self._drop_prefetched()
+        if not 0 <= index < len(self.playlist):
+            return
+        song_path, lyrics_path = self.playlist[index]
+        next_player = self._create_backend()
+        # Loading starts buffering without playing
+        next_player.load(song_path)
+        self.prefetched = {
+            "index": index, "player": next_player,
+            "lyrics": None, "lyrics_widget": None, "editor_widget": None,
+            "ready": lyrics_path is None,
+        }
+        if lyrics_path:
+            loader = LyricsLoader(index, lyrics_path)
+            loader.signals.loaded.connect(self._on_prefetch_parsed)
+            QThreadPool.globalInstance().start(loader)
+
+    def _on_prefetch_parsed(self, index, lyrics):
+        if not self.prefetched or self.prefetched["index"] != index:
+            return
+        if lyrics is not None:
+            # Widgets can only be created on the GUI thread; they wait hidden in the stack
+            lyrics_widget = LyricsWidget(lyrics, self)
+            editor_widget = EditorWidget(lyrics, self)
+            self.stack.addWidget(lyrics_widget)
+            self.stack.addWidget(editor_widget)
+            self.prefetched.update(lyrics=lyrics, lyrics_widget=lyrics_widget, editor_widget=editor_widget)
+        self.prefetched["ready"] = True
+
+    def _drop_prefetched(self):
+        if not self.prefetched:
+            return
+        for key in ("lyrics_widget", "editor_widget"):
+            if self.prefetched[key]:
+                self.stack.removeWidget(self.prefetched[key])
+                self.prefetched[key].deleteLater()
+        self.prefetched["player"].stop()
+        self.prefetched["player"].deleteLater()
+        self.prefetched = None
+
+    def next_track(self):
+        index = self.playlist_index + 1
+        if not self.prefetched or self.prefetched["index"] != index or not self.prefetched["ready"]:
+            self.play_index(index)
+            return
+        prefetched = self.prefetched
+        self.prefetched = None
+        old_player = self.player
+        self._disconnect_player(old_player)
+        old_player.stop()
+        old_player.deleteLater()
+        self.player = prefetched["player"]
+        self._connect_player(self.player)
+        self.player.set_rate(self.playback_rate)
+        self.player.play()
+        self.playlist_index = index
+        song_path, lyrics_path = self.playlist[index]
+        self.song_path = song_path
+        if self.recorder:
+            self.recorder.load("song", song_path)
+        self.onsets = None
+        if self.snap_enabled:
+            self.analyze_onsets()
+        self.label.setText(song_path.split("/")[-1])
+        self.duration_changed(self.player.duration())
+        if prefetched["lyrics"] is not None:
+            self.lyrics_path = lyrics_path
+            if self.recorder:
+                self.recorder.load("lyrics", lyrics_path)
+            self.set_lyrics(prefetched["lyrics"], prefetched["lyrics_widget"], prefetched["editor_widget"])
+        else:
+            self.clear_lyrics()
+        self.prefetch(index + 1)
+
+    def on_media_ended(self):
+        if self.playlist_index + 1 < len(self.playlist):
+            self.next_track()
+
+    def apply_lyrics_from_editor(self):
+        text = self.editor_widget.plain_text()
+        if self.recorder:
+            self.recorder.load("apply", json.dumps(text))
+
+        # Store current position
+        current_line = self.lineReached
+        current_word = self.wordReached
+
+        from Align import carry_timings
+        lyrics = Lyrics(text)
+        lyrics.songName = self.lyrics.songName
+        # Words whose tags were damaged or dropped in the edit keep their old timings
+        carry_timings(self.lyrics, lyrics)
+        self.set_lyrics(lyrics)
 
         # Restore position (within bounds)
         if current_line >= len(self.lyrics.lines):
@@ -321,7 +853,7 @@ class MusicPlayer(QMainWindow):
 
     def jump_to_word(self, word):
         if word.start_time is not None:
-            self.player.setPosition(max(0, word.start_time - 2000))
+            self.seek(max(0, word.start_time - 2000))
             for ln in self.lyrics.lines:
                 for w in ln.words:
                     if w.word_box and w.word_box.isChecked():
@@ -332,6 +864,8 @@ class MusicPlayer(QMainWindow):
                     if w == word:
                         self.lineReached = i
                         self.wordReached = j
+                        if self.recorder:
+                            self.recorder.record("jw", self.position(), i, j)
                         if self.lyrics_widget:
                             self.lyrics_widget.current_line = i
                             self.lyrics_widget.current_word = j
@@ -340,13 +874,16 @@ class MusicPlayer(QMainWindow):
     def save_lyrics(self):
         saved_lyrics = self.lyrics.songName + ".elrc"
         with open(saved_lyrics, "w", encoding="utf-8") as f:
-            out = ""
-            for x, ln in enumerate(self.lyrics.lines):
-                out += "\n" if x > 0 else ""
-                out += f"[{self._format_time(ln.start_time)}]"
-                for w in ln.words:
-                    out += f"<{self._format_time(w.start_time)}>{w.word}<{self._format_time(w.end_time)}>"
-            f.write(out)
+            f.write(self.elrc_text())
+
+    def elrc_text(self):
+        out = ""
+        for x, ln in enumerate(self.lyrics.lines):
+            out += "\n" if x > 0 else ""
+            out += f"[{self._format_time(ln.start_time)}]"
+            for w in ln.words:
+                out += f"<{self._format_time(w.start_time)}>{w.word}<{self._format_time(w.end_time)}>"
+        return out
 
     def _format_time(self, ms):
         if ms is None:
@@ -358,12 +895,13 @@ class MusicPlayer(QMainWindow):
 
 
 class MusicPlayerWindow(MusicPlayer):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, backend="qt"):
+        super().__init__(backend)
         self.lineReached = 0
         self.wordReached = 0
         self.timingWord = False
         self.pressedKey = ""
+        self.pending_edit = None
         central = QWidget()
         self.setCentralWidget(central)
         self.stack = QStackedWidget()
@@ -379,6 +917,11 @@ class MusicPlayerWindow(MusicPlayer):
         self.switch_to_editor_btn.clicked.connect(lambda: self.stack.setCurrentIndex(1))
         nav.addWidget(self.switch_to_boxes_btn)
         nav.addWidget(self.switch_to_editor_btn)
+        self.follow_btn = QPushButton("Follow Playback")
+        self.follow_btn.setCheckable(True)
+        self.follow_btn.setChecked(self.follow_playback)
+        self.follow_btn.toggled.connect(lambda checked: setattr(self, "follow_playback", checked))
+        nav.addWidget(self.follow_btn)
         outer.addLayout(nav)
 
         # File label
@@ -410,7 +953,7 @@ class MusicPlayerWindow(MusicPlayer):
         # Seek slider
         self.slider = QSlider(Qt.Orientation.Horizontal)
         self.slider.setRange(0, 0)
-        self.slider.sliderMoved.connect(self.seek)
+        self.slider.sliderMoved.connect(self.slider_seek)
         outer.addWidget(self.slider)
 
         # Timer for updating slider
@@ -447,9 +990,64 @@ class MusicPlayerWindow(MusicPlayer):
         h.addStretch()
         outer.addLayout(h)
 
-        self.player.durationChanged.connect(self.duration_changed)
-        self.player.positionChanged.connect(self.update_slider)
-        self.player.playbackStateChanged.connect(self.on_state_changed)
+        # Playlist
+        playlist_row = QHBoxLayout()
+        self.add_playlist_btn = QPushButton("Add to Playlist")
+        self.add_playlist_btn.clicked.connect(self.add_to_playlist_dialog)
+        self.next_track_btn = QPushButton("Next Track")
+        self.next_track_btn.clicked.connect(self.next_track)
+        playlist_row.addWidget(self.add_playlist_btn)
+        playlist_row.addWidget(self.next_track_btn)
+        outer.addLayout(playlist_row)
+
+        # Onset snapping for Alt+L taps
+        snap_row = QHBoxLayout()
+        self.snap_btn = QPushButton("Snap Taps to Onsets")
+        self.snap_btn.setCheckable(True)
+        self.snap_btn.toggled.connect(self.set_snap_enabled)
+        self.snap_window_box = QSpinBox()
+        self.snap_window_box.setRange(5, 500)
+        self.snap_window_box.setSuffix(" ms")
+        self.snap_window_box.setValue(self.snap_window)
+        self.snap_window_box.valueChanged.connect(self.set_snap_window)
+        snap_row.addWidget(self.snap_btn)
+        snap_row.addWidget(self.snap_window_box)
+        outer.addLayout(snap_row)
+
+        # Session recording for headless replay (see replay_session.py)
+        self.record_btn = QPushButton("Record Session")
+        self.record_btn.setCheckable(True)
+        self.record_btn.toggled.connect(self.toggle_recording)
+        outer.addWidget(self.record_btn)
+
+    def toggle_recording(self, checked):
+        if not checked:
+            self.stop_recording()
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "Record Session", "", "Session Logs (*.session)")
+        if file_path:
+            self.start_recording(file_path)
+        else:
+            self.record_btn.setChecked(False)
+
+    def start_recording(self, file_path):
+        self.stop_recording()
+        self.recorder = SessionRecorder(file_path)
+        if self.lyrics_path:
+            self.recorder.load("lyrics", self.lyrics_path)
+        if self.song_path:
+            self.recorder.load("song", self.song_path)
+        # Current state, so a session can start mid-song
+        position = self.position()
+        self.recorder.record("du", position, self.duration())
+        self.recorder.record("rt", position, round(self.playback_rate * 100))
+        self.recorder.record("sn", position, int(self.snap_enabled), self.snap_window)
+        self.recorder.record("cw", position, self.lineReached, self.wordReached)
+
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
 
     def load_song_dialog(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -458,22 +1056,37 @@ class MusicPlayerWindow(MusicPlayer):
         if file_path:
             self.load_song(file_path)
 
+    def add_to_playlist_dialog(self):
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "Add Songs", "", "Audio Files (*.mp3 *.wav *.flac *.ogg *.m4a)"
+        )
+        for file_path in file_paths:
+            self.add_to_playlist(file_path)
+        if file_paths and self.playlist_index < 0:
+            self.play_index(0)
+
     def set_volume(self, value):
-        self.audio_output.setVolume(value * 0.01)
+        self.volume = value * 0.01
+        if self.player:
+            self.player.set_volume(value * 0.01)
+        if self.prefetched:
+            self.prefetched["player"].set_volume(value * 0.01)
         self.volume_label.setText(f"Volume: {value}")
 
     def update_playbackSpeed(self, speed):
-        self.player.setPlaybackRate(speed * 0.01)
+        if self.recorder:
+            self.recorder.record("rt", self.position(), speed)
+        self.playback_rate = speed * 0.01
+        if self.player:
+            self.player.set_rate(speed * 0.01)
         self.playbackspeed_label.setText(f"Playback Speed: {speed * 0.01:.1f}x")
 
     def toggle_playback(self):
-        if self.player.playbackState() == QMediaPlayer.PlayingState:
-            self.player.pause()
-        else:
-            self.player.play()
+        if self.player:
+            self.player.toggle()
 
-    def on_state_changed(self, state):
-        if state == QMediaPlayer.PlayingState:
+    def on_state_changed(self, playing):
+        if playing:
             self.play_btn.setText("Pause")
             self.timer.start()
         else:
@@ -481,26 +1094,41 @@ class MusicPlayerWindow(MusicPlayer):
             self.timer.stop()
 
     def duration_changed(self, duration):
+        if self.recorder:
+            self.recorder.record("du", self.position(), duration)
         self.slider.setRange(0, duration)
 
     def update_slider(self):
         self.slider.blockSignals(True)
-        self.slider.setValue(self.player.position())
+        self.slider.setValue(self.position())
         self.slider.blockSignals(False)
 
     def seek(self, position):
-        self.player.setPosition(position)
+        if self.player:
+            self.player.set_position(position)
+
+    def slider_seek(self, position):
+        if self.recorder:
+            self.recorder.record("sk", self.position(), position)
+        self.seek(position)
 
     def keyPressEvent(self, event):
         if event.isAutoRepeat():
             return
+        if self.recorder:
+            self.recorder.record("kp", self.position(), event.key(), event.modifiers().value)
 
         if event.key() == Qt.Key_L and event.modifiers() & Qt.AltModifier:
             self.on_alt_l_pressed()
+        elif event.key() == Qt.Key_Z and event.modifiers() & Qt.AltModifier:
+            if event.modifiers() & Qt.ShiftModifier:
+                self.redo_timing()
+            else:
+                self.undo_timing()
         elif event.key() == Qt.Key_J and event.modifiers() & Qt.AltModifier:
-            self.seek(max(0, self.player.position() - 1000))
+            self.seek(max(0, self.position() - 1000))
         elif event.key() == Qt.Key_K and event.modifiers() & Qt.AltModifier:
-            self.seek(min(self.player.duration(), self.player.position() + 1000))
+            self.seek(min(self.duration(), self.position() + 1000))
         elif event.key() == Qt.Key_Left:
             self.navigate_word(-1)
         elif event.key() == Qt.Key_Right:
@@ -510,6 +1138,8 @@ class MusicPlayerWindow(MusicPlayer):
     def keyReleaseEvent(self, event):
         if event.isAutoRepeat():
             return
+        if self.recorder:
+            self.recorder.record("kr", self.position(), event.key(), event.modifiers().value)
         if event.key() == Qt.Key_L and event.modifiers() & Qt.AltModifier:
             self.on_alt_l_released()
         super().keyReleaseEvent(event)
@@ -539,31 +1169,81 @@ class MusicPlayerWindow(MusicPlayer):
         self.wordReached = current_word
 
     def on_alt_l_pressed(self):
-        pos = self.player.position()
-        self.lyrics.lines[self.lineReached].words[self.wordReached].start_time = pos
+        if self.lineReached >= len(self.lyrics.lines):
+            return
+        pos = self.position()
+        ln = self.lyrics.lines[self.lineReached]
+        word = ln.words[self.wordReached]
+        self.pending_edit = TimingEdit(self.lineReached, self.wordReached, word.start_time, word.end_time,
+                                       old_raw=(word.raw_start_time, word.raw_end_time),
+                                       old_line=(ln.start_time, ln.end_time))
+        word.raw_start_time = pos
+        pos = self.snap_time(pos)
+        word.start_time = pos
         if self.wordReached == 0:
-            self.lyrics.lines[self.lineReached].start_time = pos
-        self.lyrics_widget.update_times()
+            ln.start_time = pos
+        self.lyrics_widget.update_word(self.lineReached, self.wordReached)
 
     def on_alt_l_released(self):
-        pos = self.player.position()
-        self.lyrics.lines[self.lineReached].words[self.wordReached].end_time = pos
-        if self.wordReached == len(self.lyrics.lines[self.lineReached].words) - 1:
-            if self.lineReached == len(self.lyrics.lines) - 1:
-                self.save_lyrics()
+        if self.lineReached >= len(self.lyrics.lines):
+            return
+        pos = self.position()
+        ln = self.lyrics.lines[self.lineReached]
+        word = ln.words[self.wordReached]
+        edit = self.pending_edit
+        if edit is None or (edit.line_idx, edit.word_idx) != (self.lineReached, self.wordReached):
+            edit = TimingEdit(self.lineReached, self.wordReached, word.start_time, word.end_time,
+                              old_raw=(word.raw_start_time, word.raw_end_time),
+                              old_line=(ln.start_time, ln.end_time))
+        word.raw_end_time = pos
+        pos = max(self.snap_time(pos, offset=True), word.start_time or 0)
+        word.end_time = pos
+        last_word = self.wordReached == len(ln.words) - 1
+        last_line = self.lineReached == len(self.lyrics.lines) - 1
+        if last_word and not last_line:
+            ln.end_time = pos
+        edit.new_start = word.start_time
+        edit.new_end = pos
+        edit.new_raw = (word.raw_start_time, word.raw_end_time)
+        edit.new_line = (ln.start_time, ln.end_time)
+        self.history.push(edit)
+        self.pending_edit = None
+        self.lyrics_widget.update_word(self.lineReached, self.wordReached)
+        self.editor_widget.refresh_line(self.lineReached)
+        if last_word:
+            if last_line:
+                if self.autosave:
+                    self.save_lyrics()
                 return
-            self.lyrics.lines[self.lineReached].end_time = pos
             self.wordReached = 0
             self.lineReached += 1
         else:
             self.wordReached += 1
         if self.wordReached < len(self.lyrics.lines[self.lineReached].words):
             self.lyrics.lines[self.lineReached].words[self.wordReached].word_box.setChecked(True)
-        self.lyrics_widget.update_times()
-        self.editor_widget.refresh_text()
+
+    def undo_timing(self):
+        edit = self.history.undo(self.lyrics)
+        if edit:
+            self._show_timing_edit(edit)
+
+    def redo_timing(self):
+        edit = self.history.redo(self.lyrics)
+        if edit:
+            self._show_timing_edit(edit)
+            self.navigate_word(1)
+
+    def _show_timing_edit(self, edit):
+        self.lyrics_widget.update_word(edit.line_idx, edit.word_idx)
+        self.editor_widget.refresh_line(edit.line_idx)
+        self.lyrics_widget.select_word(edit.line_idx, edit.word_idx)
+        self.lineReached = edit.line_idx
+        self.wordReached = edit.word_idx
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MusicPlayerWindow()
     window.show()
-    sys.exit(app.exec())
+    code = app.exec()
+    window.stop_recording()
+    sys.exit(code)
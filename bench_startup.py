@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+# Runs in a fresh interpreter: imports the app, shows the window and stops
+# once the first event loop pass (expose + paint) has run.
+CHILD = r"""
+import time
+t0 = time.perf_counter()
+import sys
+sys.path.insert(0, {path!r})
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QTimer
+app = QApplication(sys.argv)
+t_qt = time.perf_counter()
+import {module} as app_module
+t_import = time.perf_counter()
+window = app_module.{window}()
+window.show()
+t_show = time.perf_counter()
+def done():
+    t_first = time.perf_counter()
+    print(f"{{(t_qt - t0) * 1000:.1f}} {{(t_import - t_qt) * 1000:.1f}} "
+          f"{{(t_show - t_import) * 1000:.1f}} {{(t_first - t0) * 1000:.1f}}")
+    app.quit()
+QTimer.singleShot(0, done)
+app.exec()
+"""
+
+APPS = {
+    "lyricssynk2": (".", "LyricsSynk2", "MusicPlayerWindow"),
+    "package": ("LyricsSynk", "MusicPlayer", "MusicPlayer"),
+}
+
+
+def run_once(app):
+    path, module, window = APPS[app]
+    root = os.path.dirname(os.path.abspath(__file__))
+    code = CHILD.format(path=os.path.join(root, path), module=module, window=window)
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=root, check=True)
+    wall = (time.perf_counter() - start) * 1000
+    qt, imports, build, first = (float(v) for v in out.stdout.split()[-4:])
+    return qt, imports, build, first, wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure time-to-first-window")
+    parser.add_argument("--app", choices=sorted(APPS), default="lyricssynk2")
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    runs = [run_once(args.app) for _ in range(args.runs)]
+    labels = ("QApplication", "app imports", "window build", "first window (in-process)", "first window (wall)")
+    for i, label in enumerate(labels):
+        values = [r[i] for r in runs]
+        print(f"{label:28s} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
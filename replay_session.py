@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import json
+import argparse
+import statistics
+
+# Replays a session recorded with "Record Session" in LyricsSynk2 against the
+# simulated audio backend, feeding every event through the window's own handlers.
+# The backend's clock never runs on its own: it is set to each event's
+# recorded media position.
+# Usage: python replay_session.py take.session [--out timings.elrc]
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QEvent, Qt, QKeyCombination
+from PySide6.QtGui import QKeyEvent, QKeySequence
+import LyricsSynk2
+
+
+def read_session(file_path):
+    events = []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            if line.startswith("# "):
+                kind, _, path = line[2:].partition(" ")
+                events.append((None, None, kind, path, None))
+                continue
+            wall, position, kind, a, b = line.split(" ")
+            events.append((int(wall), int(position), kind, int(a), int(b)))
+    return events
+
+
+def _key_label(kind, key, modifiers):
+    combo = QKeyCombination(Qt.KeyboardModifier(modifiers), Qt.Key(key))
+    return f"{'press' if kind == 'kp' else 'release'} {QKeySequence(combo).toString()}"
+
+
+class Replay:
+    def __init__(self, app, window, onset_timeout=30.0):
+        self.app = app
+        self.window = window
+        self.player = window._ensure_player()
+        # Reaching the last word would otherwise save into the working directory
+        window.autosave = False
+        self.onset_timeout = onset_timeout
+        self.costs = {}
+
+    def dispatch(self, kind, a, b):
+        window = self.window
+        if kind == "kp":
+            window.keyPressEvent(QKeyEvent(QEvent.KeyPress, a, Qt.KeyboardModifier(b)))
+        elif kind == "kr":
+            window.keyReleaseEvent(QKeyEvent(QEvent.KeyRelease, a, Qt.KeyboardModifier(b)))
+        elif kind == "sk":
+            window.slider_seek(a)
+        elif kind == "rt":
+            window.update_playbackSpeed(a)
+        elif kind == "jw":
+            window.jump_to_word(window.lyrics.lines[a].words[b])
+        elif kind == "du":
+            self.player.set_duration(a)
+        elif kind == "cw":
+            window.lineReached = a
+            window.wordReached = b
+            if window.lyrics_widget:
+                window.lyrics_widget.select_word(a, b)
+        elif kind == "sn":
+            window.set_snap_window(b)
+            window.set_snap_enabled(bool(a))
+
+    def _wait_for_onsets(self):
+        # Onset analysis is asynchronous in the app too; its time is not
+        # counted as handler cost
+        deadline = time.perf_counter() + self.onset_timeout
+        while self.window.onsets is None and time.perf_counter() < deadline:
+            self.app.processEvents()
+            time.sleep(0.001)
+        if self.window.onsets is None:
+            print("warning: onset analysis did not finish, taps are not snapped", file=sys.stderr)
+
+    def run(self, events):
+        window = self.window
+        start = time.perf_counter()
+        for wall, position, kind, a, b in events:
+            if wall is None:
+                if kind == "lyrics":
+                    if a:
+                        window.load_lyrics(a)
+                    else:
+                        window.clear_lyrics()
+                elif kind == "song":
+                    window.load_song(a)
+                elif kind == "apply":
+                    window.editor_widget.ensure_filled()
+                    window.editor_widget.text.setPlainText(json.loads(a))
+                    window.apply_lyrics_from_editor()
+                continue
+            self.player.set_position(position)
+            label = _key_label(kind, a, b) if kind in ("kp", "kr") else kind
+            t0 = time.perf_counter_ns()
+            self.dispatch(kind, a, b)
+            t1 = time.perf_counter_ns()
+            # Deferred deletes and queued signals, as the event loop would run them
+            self.app.processEvents()
+            t2 = time.perf_counter_ns()
+            self.costs.setdefault(label, []).append(t1 - t0)
+            self.costs.setdefault("(event loop)", []).append(t2 - t1)
+            if kind == "sn" and a and window.onsets is None:
+                self._wait_for_onsets()
+        return time.perf_counter() - start
+
+
+def report(costs, replay_s, recorded_ms, out=sys.stderr):
+    print(f"{'event':<24}{'count':>7}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'max us':>10}", file=out)
+    for label, ns in sorted(costs.items(), key=lambda kv: -sum(kv[1])):
+        ns = sorted(ns)
+        p99 = ns[min(len(ns) - 1, int(len(ns) * 0.99))]
+        print(f"{label:<24}{len(ns):>7}{statistics.mean(ns) / 1000:>10.1f}"
+              f"{statistics.median(ns) / 1000:>10.1f}{p99 / 1000:>10.1f}{ns[-1] / 1000:>10.1f}", file=out)
+    speedup = recorded_ms / 1000 / replay_s if replay_s else 0
+    print(f"replayed {recorded_ms / 1000:.1f} s of session in {replay_s * 1000:.1f} ms ({speedup:.0f}x)", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded LyricsSynk2 timing session headlessly")
+    parser.add_argument("session")
+    parser.add_argument("--out", help="write the final timings (.elrc) here instead of stdout")
+    parser.add_argument("--onset-timeout", type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    events = read_session(args.session)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = LyricsSynk2.MusicPlayerWindow(backend="sim")
+    replay = Replay(app, window, args.onset_timeout)
+    replay_s = replay.run(events)
+
+    walls = [e[0] for e in events if e[0] is not None]
+    report(replay.costs, replay_s, walls[-1] - walls[0] if walls else 0)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(window.elrc_text())
+    else:
+        print(window.elrc_text())
+
+
+if __name__ == "__main__":
+    main()